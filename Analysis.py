@@ -0,0 +1,121 @@
+# Static analysis for Core Interpreter
+# Proves, wherever it can, that identifiers are declared and initialized
+# before they are used, so engines can read them without runtime checks.
+# Declarations all come before the first statement and a repeated one stops
+# the program before any statement runs, so declaration is known statically.
+# Initialization is tracked forward through the statements: an identifier is
+# initialized once it is assigned, read, written or used in an expression
+# that was evaluated. Only the left side of && and || is certain to be
+# evaluated, so the analysis holds with or without short circuit mode.
+# The analysis marks the parse tree:
+#   Op.checked       False where the identifier read is proven initialized
+#   OutStmt.proven   identifiers proven declared and initialized at a write
+# Author: Wilmer Pellicier
+
+
+# Analyzes prog, marking the sites proven safe
+# Returns the sites that still need runtime checks, as (statement number,
+# identifier name, 'expression' or 'write') in program order. Statements are
+# numbered from 1 in the order they appear in the source
+def analyzeProgram(prog):
+    analyzer = Analyzer(ident for decl in prog.decl_seq.decls for ident in decl.idList.ids)
+    analyzer.analyzeStmtSeq(prog.stmt_seq, frozenset())
+    return analyzer.sites
+
+
+# Returns a readable report of the sites returned by analyzeProgram
+def formatSites(sites):
+    lines = ['%d runtime checks left' % len(sites)]
+    for number, name, kind in sites:
+        lines.append('  statement %d: %s in %s' % (number, name, kind))
+    return '\n'.join(lines)
+
+
+# Class for Analyzer. Walks statements in program order, tracking the
+# identifiers certainly initialized at each point
+class Analyzer:
+    def __init__(self, declared):
+        self.declared = set(declared)
+        self.sites = []
+        self.number = 0   # number of the statement being analyzed
+
+    # Analyzes statement sequence, starting with the identifiers in initialized
+    # Returns the identifiers initialized after the sequence
+    def analyzeStmtSeq(self, stmt_seq, initialized):
+        for stmt in stmt_seq.stmts:
+            initialized = self.analyzeStmt(stmt, initialized)
+        return initialized
+
+    # Analyzes statement
+    # Returns the identifiers initialized after the statement
+    def analyzeStmt(self, stmt, initialized):
+        self.number += 1
+        if stmt.altNo == 0:   # Case <assign>
+            assign = stmt.assign
+            initialized = self.analyzeExp(assign.exp, initialized)
+            return self.initialize(initialized, [assign.id])
+        elif stmt.altNo == 1:   # Case <if>
+            if_stmt = stmt.if_stmt
+            initialized = self.analyzeCond(if_stmt.c, initialized)
+            then_initialized = self.analyzeStmtSeq(if_stmt.stmtSeq1, initialized)
+            if if_stmt.altNo == 0:
+                return initialized
+            return then_initialized & self.analyzeStmtSeq(if_stmt.stmtSeq2, initialized)
+        elif stmt.altNo == 2:   # Case <loop>
+            # Initialization only grows, so what holds on entering the body
+            # the first time holds on every iteration
+            initialized = self.analyzeCond(stmt.loop.c, initialized)
+            self.analyzeStmtSeq(stmt.loop.stmt_seq, initialized)
+            return initialized
+        elif stmt.altNo == 3:   # Case <in>
+            return self.initialize(initialized, stmt.in_stmt.idList.ids)
+        else:   # Case <out>
+            out_stmt = stmt.out_stmt
+            out_stmt.proven = set()
+            for ident in out_stmt.idList.ids:
+                if ident in initialized:
+                    out_stmt.proven.add(ident)
+                else:
+                    self.sites.append((self.number, ident.name, 'write'))
+                    initialized = self.initialize(initialized, [ident])
+            return initialized
+
+    # Analyzes condition
+    # Returns the identifiers initialized once it has been evaluated
+    def analyzeCond(self, cond, initialized):
+        if cond.altNo == 0:
+            initialized = self.analyzeOp(cond.comp.op1, initialized)
+            return self.analyzeOp(cond.comp.op2, initialized)
+        elif cond.altNo == 1:
+            return self.analyzeCond(cond.not_cond, initialized)
+        initialized = self.analyzeCond(cond.left_cond, initialized)
+        self.analyzeCond(cond.right_cond, initialized)
+        return initialized
+
+    # Analyzes expression
+    # Returns the identifiers initialized once it has been evaluated
+    def analyzeExp(self, exp, initialized):
+        for fac in exp.facs:
+            for op in fac.ops:
+                initialized = self.analyzeOp(op, initialized)
+        return initialized
+
+    # Analyzes operand
+    # Returns the identifiers initialized once it has been evaluated
+    def analyzeOp(self, op, initialized):
+        if op.altNo == 1:
+            op.checked = op.id not in initialized
+            if op.checked:
+                self.sites.append((self.number, op.id.name, 'expression'))
+                return self.initialize(initialized, [op.id])
+        elif op.altNo == 2:
+            return self.analyzeExp(op.exp, initialized)
+        return initialized
+
+    # Returns initialized with the declared identifiers among ids added.
+    # Undeclared ones never get a value
+    def initialize(self, initialized, ids):
+        added = [ident for ident in ids if ident in self.declared and ident not in initialized]
+        if not added:
+            return initialized
+        return initialized.union(added)
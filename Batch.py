@@ -0,0 +1,207 @@
+# Batch runner for Core Interpreter
+# Runs many independent Core programs on a pool of worker processes. Workers
+# are started once and run job after job, so the interpreter modules are only
+# imported once per worker instead of once per program.
+# Usage: python Batch.py <directory|manifest> [options]
+#   A directory runs every .core file in it, in name order, each reading the
+#   values of its read statements from the file of the same name ending in
+#   .in when there is one.
+#   A manifest lists one program per line, optionally followed by its input
+#   file. Paths are relative to the manifest, blank lines and lines starting
+#   with # are skipped.
+# Author: Wilmer Pellicier
+import sys
+import os
+import argparse
+import concurrent.futures
+
+from Tokenizer import LEXERS
+from Interpreter import Interpreter, ENGINES
+from Output import ListOutput
+from Input import BulkInput, SequenceInput
+from Errors import CoreError
+from Cache import ParseCache, ResultCache
+from Runtime import Limits
+
+
+# Class for Job. One program to run and the file holding its input, None
+# when it has none and every read fails
+class Job:
+    def __init__(self, program, inputs=None):
+        self.program = program
+        self.inputs = inputs
+
+
+# Class for Result. What running the program of a job gave: the lines it
+# wrote, ending with 'Error: ' and the message of the error that stopped it,
+# if any, as Main.py would print them. error holds that message, None when the
+# program ran to the end
+class Result:
+    def __init__(self, job, lines, error=None, cache_hit=False):
+        self.job = job
+        self.lines = lines
+        self.error = error
+        self.cache_hit = cache_hit   # whether the parse cache held the program
+
+    # Returns the report printed for this result
+    def format(self):
+        return '\n'.join(['==== ' + self.job.program] + self.lines)
+
+
+# Returns the jobs found at path, a directory of .core files or a manifest
+def findJobs(path):
+    if os.path.isdir(path):
+        jobs = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.core'):
+                program = os.path.join(path, name)
+                inputs = program[:-len('.core')] + '.in'
+                jobs.append(Job(program, inputs if os.path.isfile(inputs) else None))
+        return jobs
+
+    base = os.path.dirname(path)
+    jobs = []
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            inputs = os.path.join(base, fields[1]) if len(fields) > 1 else None
+            jobs.append(Job(os.path.join(base, fields[0]), inputs))
+    return jobs
+
+
+# Settings of the worker process, given once when it starts
+job_settings = None
+# Parse and result caches of the worker process, kept from one job to the next
+job_cache = None
+job_results = None
+
+
+# Starts a worker process with the settings every job runs with
+def initWorker(worker_settings):
+    global job_settings, job_cache, job_results
+    job_settings = worker_settings
+    if worker_settings['parse_cache']:
+        job_cache = ParseCache(worker_settings['parse_cache'])
+    if worker_settings['result_cache']:
+        job_results = ResultCache(worker_settings['result_cache'])
+
+
+# Runs the program of job with the settings of this worker
+# Returns its Result. Errors are kept in the result, never raised, so a
+# failing program leaves the worker ready for the next job
+def runJob(job):
+    interpreter = Interpreter(job_settings['short_circuit'], job_cache, job_results,
+                              limits=job_settings['limits'])
+    hits = cacheHits()
+    output = ListOutput()
+    rt = None
+    try:
+        if job_settings['engine'] == 'python' and job_settings['cache']:
+            interpreter.loadFile(job.program, job_settings['lexer'], job_settings['optimize'])
+        else:
+            interpreter.parseFile(job.program, job_settings['lexer'])
+            if job_settings['optimize']:
+                interpreter.optimize()
+        inputs = BulkInput(job.inputs) if job.inputs else SequenceInput(())
+        rt = interpreter.run(inputs, job_settings['engine'], output)
+    except CoreError as error:
+        message = error.message
+    except Exception as error:   # a program that breaks the interpreter fails on its own
+        message = '%s: %s' % (type(error).__name__, error)
+    else:
+        message = None if rt.error is None else rt.error.message
+    if rt is None:
+        output.write('Error: ' + message)
+    return Result(job, output.lines, message, cacheHits() > hits)
+
+
+# Returns the number of loads the parse cache of this worker has served
+def cacheHits():
+    if job_cache is None:
+        return 0
+    return job_cache.hits + job_cache.disk_hits
+
+
+# Runs jobs on a pool of worker processes, one per CPU when None
+# Parameter ordered yields the results in the order of jobs, otherwise each
+# one is yielded as soon as its job completes
+# Parameter settings holds 'engine', 'lexer', 'short_circuit', 'optimize',
+# 'cache', 'parse_cache' and 'result_cache', as on the command line of Main.py,
+# and 'limits', the Limits every program is stopped at, see Runtime.py
+# Returns an iterator over the Result of each job
+def runBatch(jobs, settings, workers=None, ordered=True):
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=initWorker,
+                                                initargs=(settings,)) as executor:
+        if ordered:
+            yield from executor.map(runJob, jobs, chunksize=8)
+        else:
+            futures = [executor.submit(runJob, job) for job in jobs]
+            for future in concurrent.futures.as_completed(futures):
+                yield future.result()
+
+
+# Parses command line arguments
+def parseArgs(argv):
+    arg_parser = argparse.ArgumentParser(description='Core Interpreter batch runner')
+    arg_parser.add_argument('path', help='directory of .core files, or manifest listing programs '
+                                         'and their input files')
+    arg_parser.add_argument('--jobs', type=int, metavar='N',
+                            help='number of worker processes (default: one per CPU)')
+    arg_parser.add_argument('--unordered', action='store_true',
+                            help='report each program as soon as it completes')
+    arg_parser.add_argument('--lexer', choices=sorted(LEXERS), default='scanner',
+                            help='tokenizer implementation (default: scanner)')
+    arg_parser.add_argument('--engine', choices=sorted(ENGINES), default='tree',
+                            help='execution engine (default: tree)')
+    arg_parser.add_argument('--no-cache', action='store_true',
+                            help='do not cache code generated by the python engine')
+    arg_parser.add_argument('--parse-cache', metavar='DIR',
+                            help='share parsed programs between workers through the cache in DIR')
+    arg_parser.add_argument('--result-cache', metavar='DIR',
+                            help='share the output of programs run before on the same input '
+                                 'between workers through the cache in DIR')
+    arg_parser.add_argument('--max-statements', type=int, metavar='N',
+                            help='stop each program with an error once it has executed more '
+                                 'than N statements')
+    arg_parser.add_argument('--max-iterations', type=int, metavar='N',
+                            help='stop each program with an error once its loops have run more '
+                                 'than N iterations in all')
+    arg_parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                            help='stop each program with an error once it has run for more '
+                                 'than SECONDS')
+    arg_parser.add_argument('--short-circuit', action='store_true',
+                            help='stop evaluating && and || once the result is known')
+    arg_parser.add_argument('--optimize', action='store_true',
+                            help='fold constants and prune dead branches before running')
+    return arg_parser.parse_args(argv)
+
+
+def main():
+    args = parseArgs(sys.argv[1:])
+    settings = {'engine': args.engine, 'lexer': args.lexer, 'short_circuit': args.short_circuit,
+                'optimize': args.optimize, 'cache': not args.no_cache,
+                'parse_cache': args.parse_cache, 'result_cache': args.result_cache,
+                'limits': Limits(args.max_statements, args.max_iterations, args.timeout)}
+    try:
+        jobs = findJobs(args.path)
+    except OSError as error:
+        print('Error: ' + str(error))
+        sys.exit()
+
+    failed = 0
+    cache_hits = 0
+    for result in runBatch(jobs, settings, args.jobs, not args.unordered):
+        print(result.format())
+        if result.error is not None:
+            failed += 1
+        if result.cache_hit:
+            cache_hits += 1
+    print('%d programs, %d failed' % (len(jobs), failed), file=sys.stderr)
+    if args.parse_cache:
+        print('%d parse cache hits' % cache_hits, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+# Benchmarks for Core Interpreter
+# Usage: python Benchmark.py <benchmark> [size]
+# Author: Wilmer Pellicier
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+import tracemalloc
+import io
+import contextlib
+
+from Tokenizer import LEXERS
+from Interpreter import Interpreter, ENGINES
+from Optimizer import countNodes
+from Input import BulkInput
+from Cache import ParseCache, ResultCache, formatStats
+import Input
+
+
+# Generates a Core program with n loop blocks over a handful of variables
+def generateProgram(n):
+    lines = ['program', '\tint X, Y, Z;', '\tint COUNT1, TOTAL;', 'begin',
+             '\tX = 0;', '\tY = 1;', '\tZ = 2;', '\tTOTAL = 0;']
+    for i in range(n):
+        lines.append('\tCOUNT1 = %d;' % (i % 50))
+        lines.append('\twhile (COUNT1 > 0) loop')
+        lines.append('\t\tTOTAL = TOTAL + COUNT1 * 2 - (X + %d);' % i)
+        lines.append('\t\tif [(TOTAL > 1000) || !(Y == Z)] then')
+        lines.append('\t\t\tTOTAL = TOTAL - 1000;')
+        lines.append('\t\telse')
+        lines.append('\t\t\tX = X + 1;')
+        lines.append('\t\tend;')
+        lines.append('\t\tCOUNT1 = COUNT1 - 1;')
+        lines.append('\tend;')
+    lines.append('\twrite X, TOTAL;')
+    lines.append('end')
+    return '\n'.join(lines) + '\n'
+
+
+# Generates a small Core program whose loop runs n iterations
+def generateLoopProgram(n):
+    return """program
+\tint I, N, TOTAL, EVEN;
+begin
+\tN = %d;
+\tI = 0;
+\tTOTAL = 0;
+\tEVEN = 0;
+\twhile (I < N) loop
+\t\tTOTAL = TOTAL + I * 2 - (I - 1);
+\t\tif [(TOTAL > 100000) || !(EVEN == 0)] then
+\t\t\tTOTAL = TOTAL - 100000;
+\t\t\tEVEN = 0;
+\t\telse
+\t\t\tEVEN = 1;
+\t\tend;
+\t\tI = I + 1;
+\tend;
+\twrite I, TOTAL, EVEN;
+end
+""" % n
+
+
+# Generates a Core program whose loop runs n iterations behind compound
+# guards, where the left side of && and || usually decides the result
+def generateGuardProgram(n):
+    return """program
+\tint I, N, HITS, MISSES;
+begin
+\tN = %d;
+\tI = 0;
+\tHITS = 0;
+\tMISSES = 0;
+\twhile [(I < N) && [(HITS >= 0) && [(MISSES >= 0) && !(I == N)]]] loop
+\t\tif [(I > 2) || [(HITS > N) && [(MISSES > N) || (I == 1)]]] then
+\t\t\tHITS = HITS + 1;
+\t\telse
+\t\t\tMISSES = MISSES + 1;
+\t\tend;
+\t\tI = I + 1;
+\tend;
+\twrite I, HITS, MISSES;
+end
+""" % n
+
+
+# Generates a Core program reading n values and adding them up
+def generateReadProgram(n):
+    return """program
+\tint I, N, X, TOTAL;
+begin
+\tN = %d;
+\tI = 0;
+\tTOTAL = 0;
+\twhile (I < N) loop
+\t\tread X;
+\t\tTOTAL = TOTAL + X;
+\t\tI = I + 1;
+\tend;
+\twrite TOTAL;
+end
+""" % n
+
+
+# Writes source to a temporary file and returns its name
+def writeProgram(source):
+    fd, path = tempfile.mkstemp(suffix='.core')
+    with os.fdopen(fd, 'w') as f:
+        f.write(source)
+    return path
+
+
+# Pulls every token out of a tokenizer, returns how many there were
+def drainTokens(tokenizer):
+    count = 0
+    while tokenizer.getToken()[0] != 33:
+        tokenizer.skipToken()
+        count += 1
+    return count
+
+
+# Returns peak traced memory, in bytes, of running fn
+def peakMemory(fn, *args):
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# Times each lexer over the same generated program and reports its peak
+# traced memory
+def benchTokenizers(n):
+    path = writeProgram(generateProgram(n))
+    size = os.path.getsize(path)
+    try:
+        print('Tokenizing %d bytes' % size)
+        for name in sorted(LEXERS):
+            start = time.perf_counter()
+            count = drainTokens(LEXERS[name](path))
+            elapsed = time.perf_counter() - start
+            peak = peakMemory(lambda: drainTokens(LEXERS[name](path)))
+            print('%-8s %8d tokens  %7.3fs  %7.2f MB/s  peak %7.2f MB' %
+                  (name, count, elapsed, size / elapsed / 1e6, peak / 1e6))
+    finally:
+        os.remove(path)
+
+
+# Times one run of the parsed program on engine, output is discarded
+def timeRun(interpreter, engine, inputs=None):
+    interpreter.getExecutable(engine)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        interpreter.run(inputs, engine)
+        return time.perf_counter() - start
+
+
+# Times each execution engine over the same loop heavy program
+def benchEngines(n):
+    interpreter = Interpreter()
+    interpreter.parse(generateLoopProgram(n))
+    base = None
+    for name in ENGINES:
+        elapsed = timeRun(interpreter, name)
+        base = base or elapsed
+        print('%-8s %7.3fs  %5.2fx speedup' % (name, elapsed, base / elapsed))
+
+
+# Times each execution engine on compound loop guards, evaluating both
+# sides of && and || and in short circuit mode
+def benchGuards(n):
+    source = generateGuardProgram(n)
+    eager = Interpreter()
+    eager.parse(source)
+    short = Interpreter(short_circuit=True)
+    short.parse(source)
+    for name in ENGINES:
+        eager_time = timeRun(eager, name)
+        short_time = timeRun(short, name)
+        print('%-8s eager %7.3fs  short circuit %7.3fs  %5.2fx speedup' %
+              (name, eager_time, short_time, eager_time / short_time))
+
+
+# Times loading n integers with each way BulkInput parses, then each engine
+# running a program that reads them all
+def benchInput(n):
+    path = writeProgram('\n'.join(str(i * 7919 % 100003) for i in range(n)) + '\n')
+    try:
+        parsers = [('python', False)]
+        if Input.numpy is not None:
+            parsers.append(('numpy', True))
+        for name, use_numpy in parsers:
+            start = time.perf_counter()
+            BulkInput(path, use_numpy)
+            print('load %-7s %7.3fs' % (name, time.perf_counter() - start))
+
+        interpreter = Interpreter()
+        interpreter.parse(generateReadProgram(n))
+        for name in ENGINES:
+            inputs = BulkInput(path)
+            print('run  %-7s %7.3fs' % (name, timeRun(interpreter, name, inputs)))
+    finally:
+        os.remove(path)
+
+
+# Reports the traced memory held by the parse tree of a generated program
+def benchMemory(n):
+    source = generateProgram(n)
+    interpreter = Interpreter()
+    tracemalloc.start()
+    try:
+        interpreter.parse(source)
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    nodes = countNodes(interpreter.program)
+    print('%d nodes  %7.2f MB  %6.1f bytes per node' % (nodes, size / 1e6, size / nodes))
+
+
+# Times pretty printing a large program against running it on the tree engine
+def benchPrinter(n):
+    interpreter = Interpreter()
+    interpreter.parse(generateProgram(n))
+    out = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(out):
+        interpreter.printProgram()
+    elapsed = time.perf_counter() - start
+    print('print    %8d chars  %7.3fs' % (len(out.getvalue()), elapsed))
+    print('run      %23.3fs' % timeRun(interpreter, 'tree'))
+
+
+# Times parsing a program against loading it from each tier of the parse cache
+def benchCache(n):
+    source = generateProgram(n)
+    directory = tempfile.mkdtemp()
+    try:
+        cache = ParseCache(directory)
+        for label in ('parse', 'memory', 'disk'):
+            if label == 'disk':
+                cache.memory.clear()
+            start = time.perf_counter()
+            Interpreter(cache=cache).parse(source)
+            print('%-8s %7.3fs' % (label, time.perf_counter() - start))
+        print(formatStats(cache))
+    finally:
+        shutil.rmtree(directory)
+
+
+# Times running a loop heavy program against replaying it from the result cache
+def benchResults(n):
+    interpreter = Interpreter(results=ResultCache())
+    interpreter.parse(generateLoopProgram(n))
+    for label in ('run', 'replay'):
+        print('%-8s %7.3fs' % (label, timeRun(interpreter, 'tree', [])))
+    print(formatStats(interpreter.results))
+
+
+# Benchmarks by name, with the program size each one uses by default
+BENCHMARKS = {'tokenizer': (benchTokenizers, 2000),
+              'engines': (benchEngines, 200000),
+              'guards': (benchGuards, 200000),
+              'memory': (benchMemory, 2000),
+              'printer': (benchPrinter, 5000),
+              'cache': (benchCache, 5000),
+              'results': (benchResults, 200000),
+              'input': (benchInput, 1000000)}
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print('Usage: python Benchmark.py <%s> [size]' % '|'.join(sorted(BENCHMARKS)))
+        sys.exit()
+    bench, size = BENCHMARKS[sys.argv[1]]
+    bench(int(sys.argv[2]) if len(sys.argv) > 2 else size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,441 @@
+# Bytecode compiler and virtual machine for Core Interpreter
+# Compiles a parse tree into a flat instruction array and runs it with a
+# stack machine. Variables live in registers, the slots of the runtime frame,
+# If and Loop become jumps, and common patterns get superinstructions:
+#   X = X + c, X = X - c        INC_VAR
+#   (X < Y), (X < c), (c < X)   JUMP_UNLESS_VV, JUMP_UNLESS_VC
+# In short circuit mode && and || jump past their right side once the
+# result is known, a loop guard [(X < N) && (Y < M)] is two JUMP_UNLESS_VV
+# Author: Wilmer Pellicier
+import operator
+from array import array
+
+
+# Opcodes, followed by their operands in the code array
+HALT = 0
+LOAD_CONST = 1       # const
+LOAD_VAR = 2         # reg
+STORE_VAR = 3        # reg
+INC_VAR = 4          # reg, const
+ADD = 5
+SUB = 6
+MUL = 7
+COMPARE = 8          # cmp
+NOT = 9
+AND = 10
+OR = 11
+JUMP = 12            # target
+JUMP_IF_FALSE = 13   # target
+JUMP_UNLESS_VV = 14  # cmp, reg, reg, target
+JUMP_UNLESS_VC = 15  # cmp, reg, const, target
+READ = 16            # reg
+WRITE = 17           # reg
+FAIL = 18            # const
+JUMP_IF_FALSE_OR_POP = 19   # target
+JUMP_IF_TRUE_OR_POP = 20    # target
+LOAD_VAR_FAST = 21   # reg, proven initialized by the analysis
+WRITE_FAST = 22      # reg, proven initialized by the analysis
+STEP = 23            # count, statements of the sequence starting
+ITERATE = 24         # count, line, statements and source line of the loop body starting
+
+OPCODES = ['HALT', 'LOAD_CONST', 'LOAD_VAR', 'STORE_VAR', 'INC_VAR', 'ADD', 'SUB',
+           'MUL', 'COMPARE', 'NOT', 'AND', 'OR', 'JUMP', 'JUMP_IF_FALSE',
+           'JUMP_UNLESS_VV', 'JUMP_UNLESS_VC', 'READ', 'WRITE', 'FAIL',
+           'JUMP_IF_FALSE_OR_POP', 'JUMP_IF_TRUE_OR_POP', 'LOAD_VAR_FAST', 'WRITE_FAST',
+           'STEP', 'ITERATE']
+OPERANDS = [0, 1, 1, 1, 2, 0, 0, 0, 1, 0, 0, 0, 1, 1, 4, 4, 1, 1, 1, 1, 1, 1, 1, 1, 2]
+
+# Comparison operators, by the cmp operand of COMPARE and JUMP_UNLESS_*. None
+# stands for a token that is not a comparison operator, which is never true
+COMP_OPS = ['!=', '==', '<', '>', '<=', '>=', None]
+COMP_FUNCS = [operator.ne, operator.eq, operator.lt, operator.gt, operator.le, operator.ge,
+              lambda left, right: False]
+# Comparison giving the same result with its operands swapped
+FLIPPED = {'!=': '!=', '==': '==', '<': '>', '>': '<', '<=': '>=', '>=': '<=', None: None}
+
+
+# Class for Bytecode. A compiled program: the code array, its constants
+# (integers and error messages) and the identifier name of each register
+class Bytecode:
+    def __init__(self):
+        self.code = array('i')
+        self.consts = []
+        self.names = []
+
+
+# Compiles program node into a callable taking the runtime state
+# Parameter short_circuit makes && and || stop evaluating once the result
+# is known
+def compileProgram(prog, short_circuit=False):
+    bytecode = Compiler(short_circuit).compileProgram(prog)
+    return lambda rt: execute(bytecode, rt)
+
+
+# Class for Compiler. Emits the instructions for each node
+class Compiler:
+    def __init__(self, short_circuit=False):
+        self.bytecode = Bytecode()
+        self.const_index = {}   # (type, value) -> const
+        self.declared = set()
+        self.short_circuit = short_circuit
+
+    # Appends an instruction, returns its position
+    def emit(self, *words):
+        pos = len(self.bytecode.code)
+        self.bytecode.code.extend(words)
+        return pos
+
+    # Position of the next instruction
+    def here(self):
+        return len(self.bytecode.code)
+
+    # Points the jump target stored at pos to the next instruction
+    def patch(self, pos):
+        self.bytecode.code[pos] = self.here()
+
+    # Points every jump target stored at positions to the next instruction
+    def patchAll(self, positions):
+        for pos in positions:
+            self.patch(pos)
+
+    # Returns the const index holding value
+    def const(self, value):
+        key = (type(value), value)
+        if key not in self.const_index:
+            self.const_index[key] = len(self.bytecode.consts)
+            self.bytecode.consts.append(value)
+        return self.const_index[key]
+
+    # Compiles program node. Declarations are known statically, only a
+    # repeated declaration leaves code behind
+    def compileProgram(self, prog):
+        self.bytecode.names = [ident.name for ident in prog.symbols.slots]
+
+        for decl in prog.decl_seq.decls:
+            for ident in decl.idList.ids:
+                if ident in self.declared:
+                    self.emit(FAIL, self.const(ident.name + ' already declared'))
+                    return self.bytecode
+                self.declared.add(ident)
+
+        self.compileStmtSeq(prog.stmt_seq)
+        self.emit(HALT)
+        return self.bytecode
+
+    # Compiles statement sequence, counting its statements as it starts
+    def compileStmtSeq(self, stmt_seq):
+        if stmt_seq.stmts:
+            self.emit(STEP, len(stmt_seq.stmts))
+        self.compileStmts(stmt_seq)
+
+    # Compiles the statements of statement sequence
+    def compileStmts(self, stmt_seq):
+        for stmt in stmt_seq.stmts:
+            self.compileStmt(stmt)
+
+    # Compiles statement
+    def compileStmt(self, stmt):
+        if stmt.altNo == 0:   # Case <assign>
+            self.compileAssign(stmt.assign)
+        elif stmt.altNo == 1:   # Case <if>
+            self.compileIf(stmt.if_stmt)
+        elif stmt.altNo == 2:   # Case <loop>
+            self.compileLoop(stmt.loop, stmt.line)
+        elif stmt.altNo == 3:   # Case <in>
+            self.compileInStmt(stmt.in_stmt)
+        else:   # Case <out>
+            self.compileOutStmt(stmt.out_stmt)
+
+    # Compiles assignment, assignments to undeclared identifiers do nothing
+    def compileAssign(self, assign):
+        if assign.id not in self.declared:
+            return
+        step = self.incrementOf(assign)
+        if step is not None:
+            self.emit(INC_VAR, assign.id.slot, self.const(step))
+        else:
+            self.compileExp(assign.exp)
+            self.emit(STORE_VAR, assign.id.slot)
+
+    # Returns c for assignments of the form X = X + c or X = X - c,
+    # None for anything else
+    def incrementOf(self, assign):
+        exp = assign.exp
+        if len(exp.facs) != 2 or len(exp.facs[0].ops) != 1 or len(exp.facs[1].ops) != 1:
+            return None
+        left = exp.facs[0].ops[0]
+        right = exp.facs[1].ops[0]
+        if left.altNo != 1 or left.id is not assign.id or not self.isConst(right):
+            return None
+        return right.int_obj if exp.operators[0] == '+' else -right.int_obj
+
+    # Compiles if statement
+    def compileIf(self, if_stmt):
+        to_else = self.compileJumpUnless(if_stmt.c)
+        self.compileStmtSeq(if_stmt.stmtSeq1)
+        if if_stmt.altNo == 0:
+            self.patchAll(to_else)
+            return
+        to_end = self.emit(JUMP, 0) + 1
+        self.patchAll(to_else)
+        self.compileStmtSeq(if_stmt.stmtSeq2)
+        self.patch(to_end)
+
+    # Compiles loop on source line. Its body starts with ITERATE, counting
+    # the iteration and its statements and checking the limits of the run
+    def compileLoop(self, loop, line):
+        top = self.here()
+        to_end = self.compileJumpUnless(loop.c)
+        self.emit(ITERATE, len(loop.stmt_seq.stmts), line)
+        self.compileStmts(loop.stmt_seq)
+        self.emit(JUMP, top)
+        self.patchAll(to_end)
+
+    # Compiles read statement
+    def compileInStmt(self, in_stmt):
+        for ident in in_stmt.idList.ids:
+            if ident not in self.declared:
+                self.emit(FAIL, self.const(ident.name + ' not declared'))
+                return
+            self.emit(READ, ident.slot)
+
+    # Compiles write statement
+    def compileOutStmt(self, out_stmt):
+        for ident in out_stmt.idList.ids:
+            if ident not in self.declared:
+                self.emit(FAIL, self.const(ident.name + ' not declared'))
+                return
+            self.emit(WRITE_FAST if ident in out_stmt.proven else WRITE, ident.slot)
+
+    # Compiles jumps taken when cond is false
+    # Returns the positions of the jump targets, to be patched
+    def compileJumpUnless(self, cond):
+        if cond.altNo == 0:
+            comp = cond.comp
+            op1, op2 = comp.op1, comp.op2
+            cmp = comp.comp_op.getCompOp()
+            if self.isVar(op1) and self.isVar(op2):
+                return [self.emit(JUMP_UNLESS_VV, COMP_OPS.index(cmp), op1.id.slot,
+                                  op2.id.slot, 0) + 4]
+            if self.isVar(op1) and self.isConst(op2):
+                return [self.emit(JUMP_UNLESS_VC, COMP_OPS.index(cmp), op1.id.slot,
+                                  self.const(op2.int_obj), 0) + 4]
+            if self.isConst(op1) and self.isVar(op2):
+                return [self.emit(JUMP_UNLESS_VC, COMP_OPS.index(FLIPPED[cmp]), op2.id.slot,
+                                  self.const(op1.int_obj), 0) + 4]
+        elif cond.altNo == 2 and self.short_circuit:
+            # The right side is only reached when the left one holds
+            return self.compileJumpUnless(cond.left_cond) + self.compileJumpUnless(cond.right_cond)
+        self.compileCond(cond)
+        return [self.emit(JUMP_IF_FALSE, 0) + 1]
+
+    # Checks if operand reads a declared identifier
+    def isVar(self, op):
+        return op.altNo == 1 and op.id in self.declared
+
+    # Checks if operand is an integer literal
+    def isConst(self, op):
+        return op.altNo == 0 and op.int_obj is not None
+
+    # Compiles condition, leaving its value on the stack. Both sides of
+    # && and || are evaluated, like Cond.execCond, unless in short circuit mode
+    def compileCond(self, cond):
+        if cond.altNo == 0:
+            comp = cond.comp
+            self.compileOp(comp.op1)
+            self.compileOp(comp.op2)
+            self.emit(COMPARE, COMP_OPS.index(comp.comp_op.getCompOp()))
+        elif cond.altNo == 1:
+            self.compileCond(cond.not_cond)
+            self.emit(NOT)
+        elif self.short_circuit:
+            self.compileCond(cond.left_cond)
+            jump = JUMP_IF_FALSE_OR_POP if cond.altNo == 2 else JUMP_IF_TRUE_OR_POP
+            to_end = self.emit(jump, 0) + 1
+            self.compileCond(cond.right_cond)
+            self.patch(to_end)
+        else:
+            self.compileCond(cond.left_cond)
+            self.compileCond(cond.right_cond)
+            self.emit(AND if cond.altNo == 2 else OR)
+
+    # Compiles expression, leaving its value on the stack. Exp groups right
+    # to left, a - (b - c) is computed as a - b + c
+    def compileExp(self, exp):
+        self.compileFac(exp.facs[0])
+        for fac, negative in zip(exp.facs[1:], exp.negations()):
+            self.compileFac(fac)
+            self.emit(SUB if negative else ADD)
+
+    # Compiles factor, leaving its value on the stack
+    def compileFac(self, fac):
+        self.compileOp(fac.ops[0])
+        for op in fac.ops[1:]:
+            self.compileOp(op)
+            self.emit(MUL)
+
+    # Compiles operand, leaving its value on the stack
+    def compileOp(self, op):
+        if op.altNo == 0:
+            self.emit(LOAD_CONST, self.const(op.int_obj))
+        elif op.altNo == 1:
+            if not op.checked:
+                self.emit(LOAD_VAR_FAST, op.id.slot)
+            elif op.id in self.declared:
+                self.emit(LOAD_VAR, op.id.slot)
+            else:
+                # Undeclared identifiers can never hold a value
+                self.emit(FAIL, self.const('Identifier not initialized'))
+        else:
+            self.compileExp(op.exp)
+
+
+# Runs bytecode until HALT
+def execute(bytecode, rt):
+    # Indexing a list skips boxing each word read from the array
+    code = bytecode.code.tolist()
+    consts = bytecode.consts
+    compare = COMP_FUNCS
+    names = bytecode.names
+    rt.allocate(len(names))
+    regs = rt.frame
+    write = rt.output.write
+    fail = rt.fail
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    pc = 0
+
+    # The counters and limits are locals, the counters are handed back to the
+    # runtime state however the run ends
+    steps = rt.steps
+    iterations = rt.iterations
+    check_at = rt.check_at
+    max_steps = rt.max_steps
+    try:
+        while True:
+            op = code[pc]
+            if op == LOAD_VAR_FAST:
+                push(regs[code[pc + 1]])
+                pc += 2
+            elif op == LOAD_VAR:
+                value = regs[code[pc + 1]]
+                if value is None:
+                    fail('Identifier not initialized')
+                push(value)
+                pc += 2
+            elif op == JUMP_UNLESS_VC:
+                value = regs[code[pc + 2]]
+                if value is None:
+                    fail('Identifier not initialized')
+                if compare[code[pc + 1]](value, consts[code[pc + 3]]):
+                    pc += 5
+                else:
+                    pc = code[pc + 4]
+            elif op == JUMP_UNLESS_VV:
+                left = regs[code[pc + 2]]
+                right = regs[code[pc + 3]]
+                if left is None or right is None:
+                    fail('Identifier not initialized')
+                if compare[code[pc + 1]](left, right):
+                    pc += 5
+                else:
+                    pc = code[pc + 4]
+            elif op == INC_VAR:
+                reg = code[pc + 1]
+                if regs[reg] is None:
+                    fail('Identifier not initialized')
+                regs[reg] += consts[code[pc + 2]]
+                pc += 3
+            elif op == LOAD_CONST:
+                push(consts[code[pc + 1]])
+                pc += 2
+            elif op == STORE_VAR:
+                regs[code[pc + 1]] = pop()
+                pc += 2
+            elif op == ADD:
+                right = pop()
+                stack[-1] += right
+                pc += 1
+            elif op == SUB:
+                right = pop()
+                stack[-1] -= right
+                pc += 1
+            elif op == MUL:
+                right = pop()
+                stack[-1] *= right
+                pc += 1
+            elif op == JUMP:
+                pc = code[pc + 1]
+            elif op == ITERATE:
+                iterations += 1
+                if iterations >= check_at or steps > max_steps:
+                    check_at = rt.checkLimits(code[pc + 2], steps, iterations)
+                steps += code[pc + 1]
+                pc += 3
+            elif op == STEP:
+                steps += code[pc + 1]
+                pc += 2
+            elif op == JUMP_IF_FALSE:
+                pc = pc + 2 if pop() else code[pc + 1]
+            elif op == COMPARE:
+                right = pop()
+                stack[-1] = compare[code[pc + 1]](stack[-1], right)
+                pc += 2
+            elif op == NOT:
+                stack[-1] = not stack[-1]
+                pc += 1
+            elif op == AND:
+                right = pop()
+                stack[-1] = stack[-1] and right
+                pc += 1
+            elif op == OR:
+                right = pop()
+                stack[-1] = stack[-1] or right
+                pc += 1
+            elif op == JUMP_IF_FALSE_OR_POP:
+                if stack[-1]:
+                    pop()
+                    pc += 2
+                else:
+                    pc = code[pc + 1]
+            elif op == JUMP_IF_TRUE_OR_POP:
+                if stack[-1]:
+                    pc = code[pc + 1]
+                else:
+                    pop()
+                    pc += 2
+            elif op == READ:
+                reg = code[pc + 1]
+                regs[reg] = rt.readValue(names[reg])
+                pc += 2
+            elif op == WRITE:
+                reg = code[pc + 1]
+                if regs[reg] is None:
+                    fail(names[reg] + ' not initialized')
+                write(names[reg] + ' = ' + str(regs[reg]))
+                pc += 2
+            elif op == WRITE_FAST:
+                reg = code[pc + 1]
+                write(names[reg] + ' = ' + str(regs[reg]))
+                pc += 2
+            elif op == FAIL:
+                fail(consts[code[pc + 1]])
+            else:   # HALT
+                return
+    finally:
+        rt.steps = steps
+        rt.iterations = iterations
+
+
+# Returns a readable listing of bytecode, one instruction per line
+def disassemble(bytecode):
+    code = bytecode.code
+    lines = []
+    pc = 0
+    while pc < len(code):
+        op = code[pc]
+        operands = list(code[pc + 1:pc + 1 + OPERANDS[op]])
+        lines.append('%5d  %-20s %s' % (pc, OPCODES[op], ' '.join(map(str, operands))))
+        pc += 1 + OPERANDS[op]
+    return '\n'.join(lines)
@@ -0,0 +1,466 @@
+# Caches for Core Interpreter
+# The parse cache keeps parsed programs keyed by a hash of their source, so a
+# program seen before is loaded instead of tokenized and parsed again. The
+# result cache keeps the output of runs keyed by a hash of the program and
+# its input values, so a run seen before is replayed instead of executed.
+# Keys cover the interpreter version, entries of other versions are never
+# found and age out. Both caches have two tiers:
+#   memory   the most recently used entries of this process, LRU evicted
+#   disk     one file per entry in a directory that any number of processes
+#            may share. Entries are written to a temporary file and renamed
+#            into place, so readers never see one half written, and the least
+#            recently used are removed once the directory outgrows its budget
+# Parse cache entries hold the tree as the parser built it, before the
+# analysis or optimizer touch it, encoded as a flat list of ints walked in program order
+# and marshaled (see encodeProgram). Every load decodes a fresh tree, so
+# callers may rewrite the tree they get
+# Author: Wilmer Pellicier
+import os
+import sys
+import marshal
+import hashlib
+import collections
+
+from Parser import (Prog, DeclSeq, Decl, ID_List, StmtSeq, Stmt, Assign, If, Loop, InStmt,
+                    OutStmt, Cond, Comp, Exp, Fac, Op, SymbolTable, sharedCompOp)
+from Version import VERSION
+
+# Layout of the encoded tree and results, part of every key
+FORMAT_VERSION = 2
+
+# Comparison operators by the number they are encoded with
+COMP_NAMES = (None, '!=', '==', '<', '>', '<=', '>=')
+COMP_NUMBERS = {name: number for number, name in enumerate(COMP_NAMES)}
+
+
+# Returns a new hash holding the version of the interpreter and of the
+# entry layout, so entries of other versions are never found
+def versionHash():
+    digest = hashlib.sha256()
+    digest.update(('%s %d %d' % (VERSION, FORMAT_VERSION, marshal.version)).encode())
+    return digest
+
+
+# Returns the parse cache key of source (bytes)
+def sourceKey(source):
+    digest = versionHash()
+    digest.update(source)
+    return digest.hexdigest()
+
+
+# Returns the result cache key of a run of the program with the digest
+# given by programDigest, compiled with options (see Interpreter.getOptions),
+# on the input values. The optimizer changes the statements a run counts
+# Parameter bounds holds the limits on statements and iterations the run is
+# stopped at, None when unlimited
+def resultKey(program_digest, options, values, bounds=(None, None)):
+    digest = versionHash()
+    digest.update(program_digest)
+    digest.update(marshal.dumps(sorted(options)))
+    digest.update(marshal.dumps(bounds))
+    digest.update(marshal.dumps(values))
+    return digest.hexdigest()
+
+
+# Returns the digest identifying the program printed as listing. Printing
+# keeps every token of the program, so listings of different programs differ
+def programDigest(listing):
+    return hashlib.sha256(listing.encode()).digest()
+
+
+# Writes the chunks, bytes objects, to path, creating its directory when
+# missing. They go to a temporary file first, so readers never see path half
+# written. Writing is best effort, a directory that cannot be written leaves
+# nothing behind
+# Returns whether path was written
+def writeAtomic(path, chunks):
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(tmp, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+    return True
+
+
+# Class for Entry Cache. The memory and disk tiers the caches below keep
+# their encoded entries in, by key
+class EntryCache:
+    SUFFIX = '.entry'    # suffix of the entry files of the disk tier
+    LABEL = 'Cache'      # name of the cache in reports
+
+    # Parameter directory holds the disk tier, created when missing. None
+    # keeps the cache in memory only
+    # Parameters memory_entries and memory_bytes bound the memory tier
+    # Parameter disk_bytes is the size the disk tier is trimmed back to
+    def __init__(self, directory=None, memory_entries=256, memory_bytes=64 * 1024 * 1024,
+                 disk_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.memory = collections.OrderedDict()   # key -> encoded entry, oldest first
+        self.size = 0         # bytes held by the memory tier
+        self.hits = 0         # loads served from memory
+        self.disk_hits = 0    # loads served from disk
+        self.misses = 0       # loads that found nothing
+        self.evictions = 0    # entries dropped from either tier
+
+    # Returns the entry for key decoded by decode, or None on a miss. Entries
+    # decode returns None for are missing
+    def fetch(self, key, decode):
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return decode(data)
+
+        data = self.readEntry(key)
+        if data is not None:
+            value = decode(data)
+            if value is not None:
+                self.disk_hits += 1
+                self.remember(key, data)
+                return value
+        self.misses += 1
+        return None
+
+    # Stores the encoded entry data for key in both tiers
+    def put(self, key, data):
+        self.remember(key, data)
+        self.writeEntry(key, data)
+
+    # Returns the hit and miss counters by name
+    def stats(self):
+        return {'hits': self.hits, 'disk_hits': self.disk_hits,
+                'misses': self.misses, 'evictions': self.evictions}
+
+    # Adds data to the memory tier, evicting the least recently used entries
+    def remember(self, key, data):
+        previous = self.memory.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self.memory[key] = data
+        self.size += len(data)
+        while len(self.memory) > self.memory_entries or self.size > self.memory_bytes:
+            self.size -= len(self.memory.popitem(last=False)[1])
+            self.evictions += 1
+
+    # Returns the file of the disk tier holding key
+    def entryPath(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    # Returns the entry stored on disk for key, or None
+    def readEntry(self, key):
+        if self.directory is None:
+            return None
+        path = self.entryPath(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)   # marks the entry recently used
+        except OSError:
+            return None
+        return data
+
+    # Writes the entry for key to the disk tier, then trims it to budget.
+    # Caching is best effort, a directory that cannot be written is skipped
+    def writeEntry(self, key, data):
+        if self.directory is None:
+            return
+        if writeAtomic(self.entryPath(key), (data,)):
+            self.trim()
+
+    # Removes the least recently used entry files until the disk tier fits
+    # in disk_bytes. Other processes may be trimming at the same time, so
+    # files can vanish at any point
+    def trim(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.SUFFIX):
+                continue
+            try:
+                info = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((info.st_mtime, info.st_size, name))
+            total += info.st_size
+        entries.sort()
+        for mtime, size, name in entries:
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                self.evictions += 1
+            except OSError:
+                pass
+            total -= size
+
+
+# Class for Parse Cache. Holds parse trees by source
+class ParseCache(EntryCache):
+    SUFFIX = '.parse'
+    LABEL = 'Parse cache'
+
+    # Parameter memory_entries is the number of programs the memory tier holds
+    def __init__(self, directory=None, memory_entries=256, disk_bytes=64 * 1024 * 1024):
+        super().__init__(directory, memory_entries, disk_bytes=disk_bytes)
+
+    # Returns the parse tree cached for source (bytes), or None on a miss
+    def load(self, source):
+        return self.fetch(sourceKey(source), decode)
+
+    # Caches program, the parse tree just built from source (bytes). Trees
+    # nested too deep to encode are not cached
+    def store(self, source, program):
+        try:
+            data = marshal.dumps(encodeProgram(program))
+        except RecursionError:
+            return
+        self.put(sourceKey(source), data)
+
+
+# Class for Result Cache. Holds what runs of programs wrote, by the key of
+# the program and its input values, see resultKey. Entries are
+# (lines written, number of input values read, error message or None)
+class ResultCache(EntryCache):
+    SUFFIX = '.result'
+    LABEL = 'Result cache'
+
+    # Parameters memory_bytes and disk_bytes bound the two tiers
+    # Parameter entry_bytes is the size of the largest result kept, runs
+    # writing more are not cached
+    def __init__(self, directory=None, memory_bytes=64 * 1024 * 1024,
+                 disk_bytes=256 * 1024 * 1024, entry_bytes=4 * 1024 * 1024):
+        super().__init__(directory, sys.maxsize, memory_bytes, disk_bytes)
+        self.entry_bytes = entry_bytes
+
+    # Returns the result cached for key, or None on a miss
+    def lookup(self, key):
+        return self.fetch(key, decodeResult)
+
+    # Caches the result of the run with key
+    def record(self, key, lines, consumed, error):
+        if sum(map(len, lines)) + len(lines) > self.entry_bytes:
+            return
+        self.put(key, marshal.dumps((lines, consumed, error)))
+
+
+# Returns a readable report of the counters of cache
+def formatStats(cache):
+    return '%s: %d hits, %d disk hits, %d misses, %d evictions' % (
+        cache.LABEL, cache.hits, cache.disk_hits, cache.misses, cache.evictions)
+
+
+# Returns the result marshaled in data, or None if it is not one
+def decodeResult(data):
+    try:
+        lines, consumed, error = marshal.loads(data)
+    except (EOFError, ValueError, TypeError):
+        return None
+    return lines, consumed, error
+
+
+# Returns the parse tree marshaled in data, or None if it cannot be decoded
+def decode(data):
+    try:
+        return decodeProgram(marshal.loads(data))
+    except (EOFError, ValueError, TypeError, IndexError, KeyError, StopIteration,
+            RecursionError):
+        return None
+
+
+# Returns prog encoded as (names, code). names lists the identifiers by slot,
+# code holds the nodes in program order, each one as its alternative and
+# sizes followed by its children:
+#   program     declarations, each as its ID list, then statement sequence
+#   stmt seq    number of statements, statements
+#   id list     number of ids, slots
+#   statement   line, altNo, then <assign> slot exp, <if> cond seq 0 or cond seq 1
+#               seq, <loop> cond seq, <in> or <out> id list
+#   cond        altNo, then <comp> op comp operator op, !cond, or two conds
+#   exp         number of facs, facs, then 1 for each '-' and 0 for each '+'
+#   fac         number of ops, ops
+#   op          altNo, then the int, the slot or the exp
+def encodeProgram(prog):
+    code = [len(prog.decl_seq.decls)]
+    for decl in prog.decl_seq.decls:
+        encodeIdList(decl.idList, code)
+    encodeStmtSeq(prog.stmt_seq, code)
+    return [ident.name for ident in prog.symbols.slots], code
+
+
+# Encodes statement sequence into code
+def encodeStmtSeq(stmt_seq, code):
+    code.append(len(stmt_seq.stmts))
+    for stmt in stmt_seq.stmts:
+        code.append(stmt.line)
+        code.append(stmt.altNo)
+        if stmt.altNo == 0:   # Case <assign>
+            code.append(stmt.assign.id.slot)
+            encodeExp(stmt.assign.exp, code)
+        elif stmt.altNo == 1:   # Case <if>
+            if_stmt = stmt.if_stmt
+            encodeCond(if_stmt.c, code)
+            encodeStmtSeq(if_stmt.stmtSeq1, code)
+            code.append(if_stmt.altNo)
+            if if_stmt.altNo == 1:
+                encodeStmtSeq(if_stmt.stmtSeq2, code)
+        elif stmt.altNo == 2:   # Case <loop>
+            encodeCond(stmt.loop.c, code)
+            encodeStmtSeq(stmt.loop.stmt_seq, code)
+        else:   # Case <in> or <out>
+            encodeIdList(stmt.child.idList, code)
+
+
+# Encodes ID list into code
+def encodeIdList(id_list, code):
+    code.append(len(id_list.ids))
+    code.extend(ident.slot for ident in id_list.ids)
+
+
+# Encodes condition into code
+def encodeCond(cond, code):
+    code.append(cond.altNo)
+    if cond.altNo == 0:
+        comp = cond.comp
+        encodeOp(comp.op1, code)
+        code.append(COMP_NUMBERS[comp.comp_op.getCompOp()])
+        encodeOp(comp.op2, code)
+    elif cond.altNo == 1:
+        encodeCond(cond.not_cond, code)
+    else:
+        encodeCond(cond.left_cond, code)
+        encodeCond(cond.right_cond, code)
+
+
+# Encodes expression into code
+def encodeExp(exp, code):
+    code.append(len(exp.facs))
+    for fac in exp.facs:
+        code.append(len(fac.ops))
+        for op in fac.ops:
+            encodeOp(op, code)
+    code.extend(1 if operator == '-' else 0 for operator in exp.operators)
+
+
+# Encodes operand into code
+def encodeOp(op, code):
+    code.append(op.altNo)
+    if op.altNo == 0:
+        code.append(op.value)
+    elif op.altNo == 1:
+        code.append(op.value.slot)
+    else:
+        encodeExp(op.value, code)
+
+
+# Returns the parse tree encoded by encodeProgram as entry
+def decodeProgram(entry):
+    names, code = entry
+    symbols = SymbolTable()
+    for name in names:
+        symbols.declare(symbols.lookup(name))
+    slots = symbols.slots
+    words = iter(code)
+    nxt = words.__next__
+
+    def decodeIdList():
+        id_list = ID_List()
+        id_list.ids = [slots[nxt()] for i in range(nxt())]
+        return id_list
+
+    def decodeStmtSeq():
+        stmt_seq = StmtSeq()
+        stmts = stmt_seq.stmts
+        for i in range(nxt()):
+            stmt = Stmt()
+            stmt.line = nxt()
+            alt_no = stmt.altNo = nxt()
+            if alt_no == 0:   # Case <assign>
+                child = Assign()
+                child.id = slots[nxt()]
+                child.exp = decodeExp()
+            elif alt_no == 1:   # Case <if>
+                child = If()
+                child.c = decodeCond()
+                child.stmtSeq1 = decodeStmtSeq()
+                if nxt() == 1:
+                    child.stmtSeq2 = decodeStmtSeq()
+            elif alt_no == 2:   # Case <loop>
+                child = Loop()
+                child.c = decodeCond()
+                child.stmt_seq = decodeStmtSeq()
+            else:   # Case <in> or <out>
+                child = InStmt() if alt_no == 3 else OutStmt()
+                child.idList = decodeIdList()
+            stmt.child = child
+            stmts.append(stmt)
+        return stmt_seq
+
+    def decodeCond():
+        cond = Cond()
+        alt_no = cond.altNo = nxt()
+        if alt_no == 0:
+            comp = cond.left = Comp()
+            comp.op1 = decodeOp()
+            comp.comp_op = sharedCompOp(COMP_NAMES[nxt()])
+            comp.op2 = decodeOp()
+        elif alt_no == 1:
+            cond.left = decodeCond()
+        else:
+            cond.left = decodeCond()
+            cond.right = decodeCond()
+        return cond
+
+    def decodeExp():
+        exp = Exp()
+        facs = exp.facs
+        for i in range(nxt()):
+            fac = Fac()
+            ops = fac.ops
+            for j in range(nxt()):   # decodeOp, inlined for speed
+                op = Op()
+                alt_no = op.altNo = nxt()
+                if alt_no == 1:
+                    op.value = slots[nxt()]
+                elif alt_no == 0:
+                    op.value = nxt()
+                else:
+                    op.value = decodeExp()
+                ops.append(op)
+            facs.append(fac)
+        if len(facs) > 1:
+            exp.operators = tuple(['-' if nxt() else '+' for i in range(len(facs) - 1)])
+        return exp
+
+    def decodeOp():
+        op = Op()
+        alt_no = op.altNo = nxt()
+        if alt_no == 0:
+            op.value = nxt()
+        elif alt_no == 1:
+            op.value = slots[nxt()]
+        else:
+            op.value = decodeExp()
+        return op
+
+    prog = Prog()
+    prog.decl_seq = DeclSeq()
+    for i in range(nxt()):
+        decl = Decl()
+        decl.idList = decodeIdList()
+        prog.decl_seq.decls.append(decl)
+    prog.stmt_seq = decodeStmtSeq()
+    prog.symbols = symbols
+    if next(words, words) is not words:
+        raise ValueError('data left after the program')
+    return prog
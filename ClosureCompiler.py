@@ -0,0 +1,275 @@
+# Closure compiler for Core Interpreter
+# Compiles a parse tree once into nested Python closures. Every node becomes
+# a callable specialized for its alternative, so running the program never
+# dispatches on altNo again
+# Parameter short_circuit, passed down to every condition, makes && and ||
+# stop evaluating once the result is known
+# Parameter wrap, passed down to every statement, is called as
+# wrap(stmt, run) with the closure compiled for each statement and returns
+# the closure to run in its place, see Profiler
+# Author: Wilmer Pellicier
+
+
+# Builds the closure of a comparison whose operator is not a comparison
+# operator. Like Comp.execComp it evaluates both operands and is never true
+def compileNoComparison(left, right):
+    def run(rt):
+        left(rt)
+        right(rt)
+        return False
+    return run
+
+
+# Builds a comparison closure for each comparison operator, None for a token
+# that is not one
+COMPARISONS = {
+    '!=': lambda left, right: lambda rt: left(rt) != right(rt),
+    '==': lambda left, right: lambda rt: left(rt) == right(rt),
+    '<': lambda left, right: lambda rt: left(rt) < right(rt),
+    '>': lambda left, right: lambda rt: left(rt) > right(rt),
+    '<=': lambda left, right: lambda rt: left(rt) <= right(rt),
+    '>=': lambda left, right: lambda rt: left(rt) >= right(rt),
+    None: compileNoComparison,
+}
+
+
+# Compiles program node into a callable taking the runtime state
+def compileProgram(prog, short_circuit=False, wrap=None):
+    size = len(prog.symbols)
+    decls = compileDeclSeq(prog.decl_seq)
+    stmts = compileStmtSeq(prog.stmt_seq, short_circuit, wrap)
+    count = len(prog.stmt_seq.stmts)
+
+    def run(rt):
+        rt.allocate(size)
+        decls(rt)
+        rt.steps += count
+        stmts(rt)
+    return run
+
+
+# Compiles declaration sequence
+def compileDeclSeq(decl_seq):
+    ids = [ident for decl in decl_seq.decls for ident in decl.idList.ids]
+
+    def run(rt):
+        declared = rt.declared
+        for ident in ids:
+            if ident in declared:
+                rt.fail(ident.name + ' already declared')
+            declared.add(ident)
+    return run
+
+
+# Compiles statement sequence. Its statements are counted in the runtime
+# state by whoever runs it
+def compileStmtSeq(stmt_seq, short_circuit, wrap=None):
+    stmts = [compileStmt(stmt, short_circuit, wrap) for stmt in stmt_seq.stmts]
+
+    if len(stmts) == 1:
+        return stmts[0]
+
+    def run(rt):
+        for stmt in stmts:
+            stmt(rt)
+    return run
+
+
+# Compiles statement
+def compileStmt(stmt, short_circuit, wrap=None):
+    if stmt.altNo == 0:   # Case <assign>
+        run = compileAssign(stmt.assign)
+    elif stmt.altNo == 1:   # Case <if>
+        run = compileIf(stmt.if_stmt, short_circuit, wrap)
+    elif stmt.altNo == 2:   # Case <loop>
+        run = compileLoop(stmt.loop, stmt.line, short_circuit, wrap)
+    elif stmt.altNo == 3:   # Case <in>
+        run = compileInStmt(stmt.in_stmt)
+    else:   # Case <out>
+        run = compileOutStmt(stmt.out_stmt)
+    return run if wrap is None else wrap(stmt, run)
+
+
+# Compiles assignment
+def compileAssign(assign):
+    ident = assign.id
+    slot = ident.slot
+    exp = compileExp(assign.exp)
+
+    def run(rt):
+        if ident in rt.declared:
+            rt.frame[slot] = exp(rt)
+    return run
+
+
+# Compiles if statement
+def compileIf(if_stmt, short_circuit, wrap=None):
+    cond = compileCond(if_stmt.c, short_circuit)
+    then_seq = compileStmtSeq(if_stmt.stmtSeq1, short_circuit, wrap)
+    then_count = len(if_stmt.stmtSeq1.stmts)
+    if if_stmt.altNo == 0:
+        def run(rt):
+            if cond(rt):
+                rt.steps += then_count
+                then_seq(rt)
+        return run
+
+    else_seq = compileStmtSeq(if_stmt.stmtSeq2, short_circuit, wrap)
+    else_count = len(if_stmt.stmtSeq2.stmts)
+
+    def run(rt):
+        if cond(rt):
+            rt.steps += then_count
+            then_seq(rt)
+        else:
+            rt.steps += else_count
+            else_seq(rt)
+    return run
+
+
+# Compiles loop on source line, checking the limits of the run as each
+# iteration starts
+def compileLoop(loop, line, short_circuit, wrap=None):
+    cond = compileCond(loop.c, short_circuit)
+    body = compileStmtSeq(loop.stmt_seq, short_circuit, wrap)
+    count = len(loop.stmt_seq.stmts)
+
+    def run(rt):
+        while cond(rt):
+            rt.iterations += 1
+            if rt.iterations >= rt.check_at or rt.steps > rt.max_steps:
+                rt.checkLimits(line, rt.steps, rt.iterations)
+            rt.steps += count
+            body(rt)
+    return run
+
+
+# Compiles read statement
+def compileInStmt(in_stmt):
+    ids = in_stmt.idList.ids
+
+    def run(rt):
+        for ident in ids:
+            if ident not in rt.declared:
+                rt.fail(ident.name + ' not declared')
+            rt.frame[ident.slot] = rt.readValue(ident.name)
+    return run
+
+
+# Compiles write statement, IDs proven declared and initialized skip the checks
+def compileOutStmt(out_stmt):
+    ids = [(ident, ident in out_stmt.proven) for ident in out_stmt.idList.ids]
+
+    def run(rt):
+        for ident, proven in ids:
+            value = rt.frame[ident.slot]
+            if not proven:
+                if ident not in rt.declared:
+                    rt.fail(ident.name + ' not declared')
+                if value is None:
+                    rt.fail(ident.name + ' not initialized')
+            rt.output.write(ident.name + ' = ' + str(value))
+    return run
+
+
+# Compiles condition
+def compileCond(cond, short_circuit):
+    if cond.altNo == 0:
+        return compileComp(cond.comp)
+    elif cond.altNo == 1:
+        not_cond = compileCond(cond.not_cond, short_circuit)
+        return lambda rt: not not_cond(rt)
+
+    left = compileCond(cond.left_cond, short_circuit)
+    right = compileCond(cond.right_cond, short_circuit)
+    if short_circuit:
+        if cond.altNo == 2:
+            return lambda rt: left(rt) and right(rt)
+        return lambda rt: left(rt) or right(rt)
+
+    # Both sides are always evaluated, like Cond.execCond
+    if cond.altNo == 2:
+        def run(rt):
+            left_val = left(rt)
+            right_val = right(rt)
+            return left_val and right_val
+    else:
+        def run(rt):
+            left_val = left(rt)
+            right_val = right(rt)
+            return left_val or right_val
+    return run
+
+
+# Compiles comparison
+def compileComp(comp):
+    left = compileOp(comp.op1)
+    right = compileOp(comp.op2)
+    return COMPARISONS[comp.comp_op.getCompOp()](left, right)
+
+
+# Compiles expression, keeping its right to left grouping
+def compileExp(exp):
+    facs = [compileFac(fac) for fac in exp.facs]
+    if len(facs) == 1:
+        return facs[0]
+
+    negations = exp.negations()
+    if len(facs) == 2:
+        left, right = facs
+        if negations[0]:
+            return lambda rt: left(rt) - right(rt)
+        return lambda rt: left(rt) + right(rt)
+
+    first = facs[0]
+    terms = list(zip(facs[1:], negations))
+
+    def run(rt):
+        res = first(rt)
+        for fac, negative in terms:
+            if negative:
+                res -= fac(rt)
+            else:
+                res += fac(rt)
+        return res
+    return run
+
+
+# Compiles factor
+def compileFac(fac):
+    ops = [compileOp(op) for op in fac.ops]
+    if len(ops) == 1:
+        return ops[0]
+    if len(ops) == 2:
+        left, right = ops
+        return lambda rt: left(rt) * right(rt)
+
+    first = ops[0]
+    rest = ops[1:]
+
+    def run(rt):
+        res = first(rt)
+        for op in rest:
+            res *= op(rt)
+        return res
+    return run
+
+
+# Compiles operand
+def compileOp(op):
+    if op.altNo == 0:
+        value = op.int_obj
+        return lambda rt: value
+    elif op.altNo == 1:
+        slot = op.id.slot
+        if not op.checked:
+            return lambda rt: rt.frame[slot]
+
+        def run(rt):
+            value = rt.frame[slot]
+            if value is None:
+                rt.fail('Identifier not initialized')
+            return value
+        return run
+    else:
+        return compileExp(op.exp)
@@ -0,0 +1,96 @@
+# Precompiled program format for Core Interpreter
+# A .corec file holds a program compiled for the bytecode VM, so workers can
+# run it without tokenizing or parsing. Layout:
+#   header    magic, format version, sha256 of the Core source, crc32 of the
+#             rest of the file, length of the symbol section, code words
+#   symbols   marshal of (interpreter version, byte order, compile options,
+#             register names, constants, pretty printed listing)
+#   code      the instruction words in that byte order, 4 byte aligned
+# Loading maps the file read-only, checks every field and copies the code
+# words out, the VM runs them from a list of its own anyway. Any mismatch (a
+# stale, truncated or corrupt file) reports it as unusable, so callers fall
+# back to parsing the source
+# Author: Wilmer Pellicier
+import sys
+import mmap
+import zlib
+import struct
+import marshal
+import hashlib
+from array import array
+
+import Cache
+from BytecodeVM import Bytecode
+from Version import VERSION
+
+MAGIC = b'COREC\x00\r\n'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<8sI32sIII')
+
+
+# Returns the digest stored in .corec files for source (bytes)
+def sourceHash(source):
+    return hashlib.sha256(source).digest()
+
+
+# Writes bytecode to path through Cache.writeAtomic, so readers never map it
+# half written. Writing is best effort, a read-only directory just leaves no
+# file behind
+# Parameter options names the compile options bytecode was built with
+def dumpProgram(path, bytecode, listing, source, options=()):
+    symbols = marshal.dumps((VERSION, sys.byteorder, sorted(options), list(bytecode.names),
+                             list(bytecode.consts), listing))
+    symbols += b'\x00' * (-(HEADER.size + len(symbols)) % 4)
+    code = bytecode.code.tobytes()
+    crc = zlib.crc32(code, zlib.crc32(symbols))
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, sourceHash(source), crc,
+                         len(symbols), len(bytecode.code))
+    Cache.writeAtomic(path, (header, symbols, code))
+
+
+# Maps the .corec file in path. Returns (bytecode, listing), or None if the
+# file is missing, corrupt, written by another interpreter version or does
+# not match source (bytes, None skips that check) and options. The mapping
+# is closed before returning
+def loadProgram(path, source=None, options=()):
+    try:
+        with open(path, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        return readProgram(buf, source, options)
+    finally:
+        buf.close()
+
+
+# Returns (bytecode, listing) read from buf, the mapped .corec file, or None
+# if any check fails, see loadProgram
+def readProgram(buf, source, options):
+    if len(buf) < HEADER.size:
+        return None
+    magic, version, digest, crc, symbols_len, words = HEADER.unpack_from(buf)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return None
+    if source is not None and digest != sourceHash(source):
+        return None
+    code_start = HEADER.size + symbols_len
+    if len(buf) != code_start + 4 * words:
+        return None
+    with memoryview(buf) as view:
+        if zlib.crc32(view[HEADER.size:]) != crc:
+            return None
+        try:
+            interpreter, byteorder, compiled, names, consts, listing = marshal.loads(
+                view[HEADER.size:code_start])
+        except (EOFError, ValueError, TypeError):
+            return None
+        if interpreter != VERSION or byteorder != sys.byteorder or compiled != sorted(options):
+            return None
+
+        bytecode = Bytecode()
+        bytecode.code = array('i')
+        bytecode.code.frombytes(view[code_start:])
+    bytecode.names = names
+    bytecode.consts = consts
+    return bytecode, listing
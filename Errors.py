@@ -0,0 +1,34 @@
+# Errors for Core Interpreter
+# Parse and runtime errors are raised as CoreError instead of stopping the
+# process, so one bad program does not take down a caller running many
+# Author: Wilmer Pellicier
+
+
+# Class for Core Error. Raised for any error in a Core program, message
+# describes it without the 'Error: ' prefix it is reported with
+class CoreError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+# Class for Limit Error. Raised when a run goes over one of its Limits, see
+# Runtime.py. limit names the one exceeded, 'statements', 'iterations' or
+# 'seconds', and bound is its value. line is the source line of the loop
+# starting another iteration, steps and iterations the counters of the run at
+# that point and seconds the time it had been running
+class LimitError(CoreError):
+    def __init__(self, limit, bound, line, steps, iterations, seconds):
+        super().__init__('%s exceeded on line %d after %d statements and %d iterations'
+                         % (LIMIT_NAMES[limit] % bound, line, steps, iterations))
+        self.limit = limit
+        self.bound = bound
+        self.line = line
+        self.steps = steps
+        self.iterations = iterations
+        self.seconds = seconds
+
+
+# How each limit, given its bound, is named in messages
+LIMIT_NAMES = {'statements': 'Statement limit of %d', 'iterations': 'Iteration limit of %d',
+               'seconds': 'Time limit of %g seconds'}
@@ -0,0 +1,136 @@
+# Input providers for Core Interpreter
+# read statements take their values from the input provider of the run.
+# Providers have one method:
+#   readInt(name)   returns the next value, as an int, for the identifier
+#                   called name, or None when there is no input left. Raises
+#                   ValueError when the value is not an integer
+# Providers that know all their values up front also have:
+#   remaining()     returns the list of values not read yet, as ints
+#   advance(count)  skips count values, as if they had been read
+# Author: Wilmer Pellicier
+import re
+import sys
+import warnings
+
+from Errors import CoreError
+
+try:
+    import numpy
+except ImportError:   # optional, BulkInput parses with Python alone
+    numpy = None
+
+# Words this long may not fit in the int64 values NumPy parses into
+LONG_WORD = 19
+# Text NumPy reads differently from int(): anything but signs, digits and
+# whitespace, and signs that are not the first of a word or have no digit
+# after them, which NumPy takes as a number or skips
+NOT_DIGIT = re.compile(r'[^-+0-9\s]')
+STRAY_SIGN = re.compile(r'[-+](?:(?![0-9])|(?<=\S[-+]))')
+
+
+# Class for Prompt Input. Asks for each value on standard input
+class PromptInput:
+    # Parameter output is the sink of the run, flushed so a prompt follows
+    # the output written so far
+    def __init__(self, output):
+        self.output = output
+
+    # Prompts for the value of name and returns it, None once standard input
+    # has ended
+    def readInt(self, name):
+        self.output.flush()
+        print('\nEnter value for ' + name + ':')  # Comment this line if not needed
+        try:
+            return int(input())
+        except EOFError:
+            return None
+
+
+# Class for Sequence Input. Hands out the values of a sequence in order,
+# such as a list of strings or ints given by an embedding caller
+class SequenceInput:
+    def __init__(self, values):
+        self.values = list(values)
+        self.pos = 0
+
+    # Returns the next value, None when they have run out
+    def readInt(self, name):
+        pos = self.pos
+        if pos == len(self.values):
+            return None
+        self.pos = pos + 1
+        return int(self.values[pos])
+
+    # Returns the values not read yet
+    def remaining(self):
+        return [int(value) for value in self.values[self.pos:]]
+
+    # Skips count values
+    def advance(self, count):
+        self.pos += count
+
+
+# Class for Bulk Input. Reads a whole file or stream of whitespace separated
+# integers in one go and hands them out from memory, without prompting
+class BulkInput:
+    # Parameter source is a file name, '-' for standard input, or a text
+    # stream
+    # Parameter use_numpy parses with NumPy when it is installed
+    # Raises CoreError when the source holds anything but integers
+    def __init__(self, source, use_numpy=True):
+        if source == '-':
+            data = sys.stdin.read()
+        elif isinstance(source, str):
+            with open(source) as f:
+                data = f.read()
+        else:
+            data = source.read()
+        try:
+            self.values = parseInts(data, use_numpy)
+        except ValueError:
+            raise CoreError('Invalid input value ' + findInvalid(data)) from None
+        self.pos = 0
+
+    # Returns the next value, None when they have run out
+    def readInt(self, name):
+        pos = self.pos
+        if pos == len(self.values):
+            return None
+        self.pos = pos + 1
+        return self.values[pos]
+
+    # Returns the values not read yet
+    def remaining(self):
+        return self.values[self.pos:]
+
+    # Skips count values
+    def advance(self, count):
+        self.pos += count
+
+
+# Returns the list of whitespace separated integers in data. NumPy parses in
+# C when it is available, every value fits in int64 and every word is a plain
+# integer, anything else falls back to int() on each value
+def parseInts(data, use_numpy=True):
+    words = data.split()
+    if (use_numpy and numpy is not None and max(map(len, words), default=0) < LONG_WORD
+            and not NOT_DIGIT.search(data) and not STRAY_SIGN.search(data)):
+        with warnings.catch_warnings():
+            # NumPy only warns when it stops at text that is not a number
+            warnings.simplefilter('error')
+            try:
+                values = numpy.fromstring(data, dtype=numpy.int64, sep=' ').tolist()
+            except (ValueError, DeprecationWarning):
+                values = None
+        if values is not None and len(values) == len(words):
+            return values
+    return list(map(int, words))
+
+
+# Returns the first whitespace separated word of data that is not an integer
+def findInvalid(data):
+    for word in data.split():
+        try:
+            int(word)
+        except ValueError:
+            return word
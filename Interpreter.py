@@ -0,0 +1,302 @@
+# Interpreter class for Core Interpreter
+# Each instance owns one parsed program and runs it any number of times,
+# so a single process can serve many programs one after another or on threads
+# Author: Wilmer Pellicier
+import sys
+import time
+
+from Tokenizer import LEXERS, StreamTokenizer
+from Parser import Parser
+from Runtime import Runtime
+from Errors import CoreError, LimitError
+from Output import RecordingOutput, CountingOutput
+import ClosureCompiler
+import Transpiler
+import BytecodeVM
+import Corec
+import Optimizer
+import Analysis
+import Cache
+import Profiler
+
+
+# Tree walking engine, runs the parse tree directly. It takes the short
+# circuit mode from the runtime state instead
+def treeEngine(prog, short_circuit=False):
+    return prog.execProgram
+
+
+# Execution engines, by the name used on the command line. Each one turns a
+# parse tree into a callable taking the runtime state, given whether && and
+# || stop evaluating once the result is known
+ENGINES = {'tree': treeEngine, 'closure': ClosureCompiler.compileProgram,
+           'python': Transpiler.compileProgram, 'vm': BytecodeVM.compileProgram}
+
+
+class Interpreter:
+    # Parameter short_circuit stops && and || from evaluating their right
+    # side once the left one decides the result. Conditions cannot change
+    # state, only a read of an uninitialized identifier that is skipped no
+    # longer stops the program
+    # Parameter cache is the ParseCache, see Cache.py, that parse and
+    # parseFile load programs from and store them in. None parses every time
+    # Parameter results is the ResultCache, see Cache.py, that runs given
+    # all their input values up front are replayed from and recorded in.
+    # None executes every run
+    # Parameter metrics is the Metrics, see Metrics.py, every parse and run
+    # is recorded in. None records nothing
+    # Parameter limits is the Limits, see Runtime.py, every run is stopped at
+    # with a LimitError. None lets runs go on for as long as they take
+    def __init__(self, short_circuit=False, cache=None, results=None, metrics=None,
+                 limits=None):
+        self.short_circuit = short_circuit
+        self.cache = cache
+        self.results = results
+        self.metrics = metrics
+        self.limits = limits
+        self.program = None
+        self.listing = None     # pretty printed program when loaded from cache or optimized
+        self.digest = None      # digest of the program for the result cache, once computed
+        self.executables = {}   # engine name -> compiled program
+        self.eliminated = None  # parse tree nodes removed by the optimizer
+        self.optimized = False  # whether the program was optimized, changing its counts
+        self.sites = None       # sites left with runtime checks by the analysis
+
+    # Parses source, a string or text stream holding a Core program
+    def parse(self, source):
+        if self.cache is None:
+            return self.parseTokens(StreamTokenizer(source))
+        if not isinstance(source, str):
+            source = source.read()
+        return self.parseCached(source.encode(), lambda: StreamTokenizer(source))
+
+    # Parses the Core program stored in filename with the named lexer
+    def parseFile(self, filename, lexer='scanner'):
+        if self.cache is None:
+            return self.parseTokens(LEXERS[lexer](filename))
+        with open(filename, 'rb') as f:
+            source = f.read()
+        return self.parseCached(source, lambda: LEXERS[lexer](filename))
+
+    # Takes the parse tree of source (bytes) from the cache, or builds it from
+    # the tokenizer makeTokenizer returns and caches it
+    def parseCached(self, source, makeTokenizer):
+        program = self.cache.load(source)
+        if program is None:
+            program = self.buildTree(makeTokenizer())
+            self.cache.store(source, program)
+        return self.setProgram(program)
+
+    # Builds the parse tree from tokenizer and keeps it for later runs
+    # Raises CoreError when the program does not parse
+    def parseTokens(self, tokenizer):
+        return self.setProgram(self.buildTree(tokenizer))
+
+    # Returns the parse tree built from tokenizer, recording the parse in the
+    # metrics
+    def buildTree(self, tokenizer):
+        parser = Parser()
+        program = parser.startParsing(tokenizer)
+        if self.metrics is not None:
+            self.metrics.recordParse(tokenizer, parser)
+        return program
+
+    # Keeps program, a parse tree fresh from the parser, for later runs
+    def setProgram(self, program):
+        self.program = program
+        self.listing = None
+        self.digest = None
+        self.executables = {}
+        self.eliminated = None
+        self.optimized = False
+        self.sites = Analysis.analyzeProgram(self.program)
+        return self.program
+
+    # Runs the optimizer over the parsed program. The program is still
+    # printed as it was written
+    # Returns the number of parse tree nodes eliminated
+    def optimize(self):
+        self.listing = self.renderProgram()
+        self.executables = {}
+        self.eliminated = Optimizer.optimizeProgram(self.program)
+        self.optimized = True
+        # The rewritten tree has new operands and control flow to analyze
+        self.sites = Analysis.analyzeProgram(self.program)
+        return self.eliminated
+
+    # Loads the Core program stored in filename for the python engine. The
+    # generated code is cached on disk, keyed by a hash of the source, so later
+    # runs of an unchanged file skip tokenizing, parsing and code generation
+    # Parameter optimize runs the optimizer before generating code
+    def loadFile(self, filename, lexer='scanner', optimize=False):
+        with open(filename, 'rb') as f:
+            source = f.read()
+        path = Transpiler.cachePath(filename, source, self.getOptions(optimize))
+        entry = Transpiler.loadCached(path)
+        if entry is not None:
+            self.program = None
+            self.listing, code = entry
+            self.digest = None
+            self.optimized = optimize
+            self.executables = {'python': Transpiler.loadCode(code)}
+            return
+
+        self.parseFile(filename, lexer)
+        if optimize:
+            self.optimize()
+        code = Transpiler.compileCode(self.program, self.short_circuit)
+        if code is not None:
+            Transpiler.storeCached(path, self.renderProgram(), code)
+            self.executables['python'] = Transpiler.loadCode(code)
+
+    # Loads the Core program stored in filename for the vm engine through the
+    # precompiled program in corec_path. That file is used when it matches the
+    # source, and is written again whenever it is missing, stale or corrupt
+    # Parameter optimize runs the optimizer on the program written to corec_path
+    def loadCorec(self, filename, corec_path, lexer='scanner', optimize=False):
+        with open(filename, 'rb') as f:
+            source = f.read()
+        options = self.getOptions(optimize)
+        loaded = Corec.loadProgram(corec_path, source, options)
+        if loaded is None:
+            self.parseFile(filename, lexer)
+            if optimize:
+                self.optimize()
+            bytecode = BytecodeVM.Compiler(self.short_circuit).compileProgram(self.program)
+            Corec.dumpProgram(corec_path, bytecode, self.renderProgram(), source, options)
+        else:
+            self.program = None
+            bytecode, self.listing = loaded
+            self.digest = None
+            self.optimized = optimize
+        self.executables = {'vm': lambda rt: BytecodeVM.execute(bytecode, rt)}
+
+    # Returns the names of the options compiled programs depend on, stored
+    # with cached programs so they are only reused with the same options
+    def getOptions(self, optimize=False):
+        options = []
+        if optimize:
+            options.append('optimize')
+        if self.short_circuit:
+            options.append('short_circuit')
+        return options
+
+    # Returns the pretty printed program as a string
+    def renderProgram(self):
+        if self.listing is not None:
+            return self.listing
+        return self.program.renderProgram()
+
+    # Pretty prints the parsed program, written out in one go
+    def printProgram(self):
+        sys.stdout.write(self.renderProgram())
+
+    # Returns the parsed program compiled for engine, compiling it only once
+    def getExecutable(self, engine):
+        if engine not in self.executables:
+            self.executables[engine] = ENGINES[engine](self.program, self.short_circuit)
+        return self.executables[engine]
+
+    # Runs the parsed program once with its own runtime state
+    # Parameter inputs holds the values for read statements, when omitted
+    # values are prompted for on standard input
+    # Parameter output is the sink for the lines written, see Output.py,
+    # buffered standard output when omitted. It is flushed when the run ends,
+    # however it ends
+    # A runtime error stops the program and is written to output as its last
+    # line, 'Error: ' and the message, and kept in the error of the runtime.
+    # So does going over the limits, with a LimitError
+    # Returns the runtime state the run finished with
+    def run(self, inputs=None, engine='tree', output=None):
+        rt = Runtime(inputs, self.short_circuit, output, self.limits)
+        self.measureRun(rt, lambda: self.runCached(rt, engine))
+        return rt
+
+    # Runs the parsed program on engine with runtime state rt, or replays an
+    # earlier identical run kept by the result cache
+    def runCached(self, rt, engine):
+        key = self.getResultKey(rt.input)
+        if key is not None:
+            result = self.results.lookup(key)
+            if result is not None:
+                replayResult(rt, result)
+                return
+            pending = len(rt.input.remaining())
+            recorder = rt.output = RecordingOutput(rt.output)
+
+        execute(self.getExecutable(engine), rt)
+        if key is None:
+            return
+        rt.output = recorder.sink
+        # Runs stopped at a limit are not kept: where a time limit stops them
+        # changes from one run to the next, and the line reported depends on
+        # the layout of the source, which the program digest leaves out
+        if not isinstance(rt.error, LimitError):
+            consumed = pending - len(rt.input.remaining())
+            self.results.record(key, recorder.lines, consumed,
+                                None if rt.error is None else rt.error.message)
+
+    # Runs the parsed program once like run, on closures instrumented to
+    # record where the time goes, see Profiler.py. Results are never cached
+    # Returns the runtime state the run finished with and its Profile
+    def profile(self, inputs=None, output=None):
+        profile = Profiler.Profile()
+        rt = Runtime(inputs, self.short_circuit, output, self.limits)
+        executable = Profiler.compileProgram(self.program, profile, self.short_circuit)
+        self.measureRun(rt, lambda: execute(executable, rt))
+        return rt, profile
+
+    # Calls action, which runs the program with runtime state rt, recording
+    # the run in the metrics
+    def measureRun(self, rt, action):
+        if self.metrics is None:
+            action()
+            return
+        sink = rt.output
+        rt.output = CountingOutput(sink)
+        start = time.perf_counter()
+        action()
+        self.metrics.recordRun(rt, rt.output.count, time.perf_counter() - start)
+        rt.output = sink
+
+    # Returns the result cache key of a run reading from the input provider,
+    # or None when runs are not cached or the provider cannot tell its values
+    # up front, like prompting does
+    def getResultKey(self, provider):
+        if self.results is None or not hasattr(provider, 'remaining'):
+            return None
+        try:
+            values = provider.remaining()
+        except (ValueError, TypeError):   # left for the run to report
+            return None
+        if self.digest is None:
+            self.digest = Cache.programDigest(self.renderProgram())
+        bounds = (None, None) if self.limits is None else self.limits.bounds()
+        options = self.getOptions(self.optimized)
+        return Cache.resultKey(self.digest, options, values, bounds)
+
+
+# Runs executable, a compiled program, with the runtime state rt. A runtime
+# error is written to the output of rt and kept in its error. The output is
+# flushed however the run ends
+def execute(executable, rt):
+    try:
+        executable(rt)
+    except CoreError as error:
+        rt.error = error
+        rt.output.write('Error: ' + error.message)
+    finally:
+        rt.output.flush()
+
+
+# Hands the result of an earlier identical run, as kept by the result cache,
+# to the runtime state rt as if the program had run again
+def replayResult(rt, result):
+    lines, consumed, message = result
+    for line in lines:
+        rt.output.write(line)
+    rt.input.advance(consumed)
+    rt.reads += consumed
+    if message is not None:
+        rt.error = CoreError(message)
+    rt.output.flush()
@@ -1,25 +1,166 @@
 import sys
-from Tokenizer import Tokenizer
-from Parser import Parser
+import argparse
+from Tokenizer import LEXERS
+from Interpreter import Interpreter, ENGINES
+from Analysis import formatSites
+from Output import BufferedOutput
+from Input import BulkInput
+from Errors import CoreError
+from Runtime import Limits
+from Cache import ParseCache, ResultCache, formatStats
+from Metrics import Metrics
+
+# What main does with the program: run it, pretty print it, or print then run it
+MODES = ('both', 'print', 'run')
+# Hottest statements listed in the profile report
+PROFILE_LINES = 20
+# Formats the metrics can be written in
+METRICS_FORMATS = ('json', 'prometheus')
+
+
+# Parses command line arguments
+def parseArgs(argv):
+    arg_parser = argparse.ArgumentParser(description='Core Interpreter')
+    arg_parser.add_argument('file', help="Core program to run, '-' reads it from standard input")
+    arg_parser.add_argument('--lexer', choices=sorted(LEXERS), default='scanner',
+                            help='tokenizer implementation (default: scanner)')
+    arg_parser.add_argument('--engine', choices=sorted(ENGINES), default='tree',
+                            help='execution engine (default: tree)')
+    arg_parser.add_argument('--mode', choices=MODES, default='both',
+                            help='run the program, only pretty print it, or both (default: both)')
+    arg_parser.add_argument('--no-cache', action='store_true',
+                            help='do not cache code generated by the python engine')
+    arg_parser.add_argument('--corec', metavar='PATH',
+                            help='run on the vm engine through precompiled program PATH, '
+                                 'written when missing or out of date')
+    arg_parser.add_argument('--parse-cache', metavar='DIR',
+                            help='load parsed programs from the cache in DIR, adding them when '
+                                 'missing, and report its counters on standard error')
+    arg_parser.add_argument('--result-cache', metavar='DIR',
+                            help='replay the output of runs seen before from the cache in DIR, '
+                                 'adding new ones, and report its counters on standard error. '
+                                 'Only runs given their values with --input are cached')
+    arg_parser.add_argument('--profile', metavar='PATH',
+                            help='run on closures instrumented to time each statement, whatever '
+                                 'the engine, then report the hot spots on standard error and '
+                                 'write the full profile to PATH as JSON')
+    arg_parser.add_argument('--metrics', metavar='PATH',
+                            help="write counters and timings of tokenizing, parsing and execution "
+                                 "to PATH when done, '-' for standard error")
+    arg_parser.add_argument('--metrics-format', choices=METRICS_FORMATS, default='json',
+                            help='format of the metrics, JSON or Prometheus text format '
+                                 '(default: json)')
+    arg_parser.add_argument('--max-statements', type=int, metavar='N',
+                            help='stop the program with an error once it has executed more '
+                                 'than N statements')
+    arg_parser.add_argument('--max-iterations', type=int, metavar='N',
+                            help='stop the program with an error once its loops have run more '
+                                 'than N iterations in all')
+    arg_parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                            help='stop the program with an error once it has run for more '
+                                 'than SECONDS')
+    arg_parser.add_argument('--short-circuit', action='store_true',
+                            help='stop evaluating && and || once the result is known')
+    arg_parser.add_argument('--optimize', action='store_true',
+                            help='fold constants and prune dead branches before running, '
+                                 'the number of nodes eliminated is reported on standard error')
+    arg_parser.add_argument('--input', metavar='PATH',
+                            help="read the values of read statements from PATH, '-' for standard "
+                                 'input, as whitespace separated integers without prompting')
+    arg_parser.add_argument('--output', metavar='PATH',
+                            help='write the output of the program to PATH instead of standard output')
+    arg_parser.add_argument('--report-checks', action='store_true',
+                            help='report on standard error the identifier uses whose '
+                                 'runtime checks could not be removed')
+    args = arg_parser.parse_args(argv)
+    if args.file == '-' and args.input == '-':
+        arg_parser.error('the program and its input cannot both come from standard input')
+    return args
 
 
 def main():
-    # get file
-    f = sys.argv[1]
+    # get file and options
+    args = parseArgs(sys.argv[1:])
 
-    # Tokenize Core file
-    tokenizer = Tokenizer(f)
+    # Tokenize Core file, or stream it from standard input, and generate parse tree
+    cache = ParseCache(args.parse_cache) if args.parse_cache else None
+    results = ResultCache(args.result_cache) if args.result_cache else None
+    metrics = Metrics() if args.metrics else None
+    limits = Limits(args.max_statements, args.max_iterations, args.timeout)
+    interpreter = Interpreter(args.short_circuit, cache, results, metrics, limits)
+    try:
+        if args.file == '-':
+            interpreter.parse(sys.stdin)
+        elif args.profile:   # the profiler runs on the parse tree, skip compiled caches
+            interpreter.parseFile(args.file, args.lexer)
+        elif args.corec:
+            interpreter.loadCorec(args.file, args.corec, args.lexer, args.optimize)
+            args.engine = 'vm'
+        elif args.engine == 'python' and not args.no_cache:
+            interpreter.loadFile(args.file, args.lexer, args.optimize)
+        else:
+            interpreter.parseFile(args.file, args.lexer)
+    except CoreError as error:
+        print('Error: ' + error.message)
+        sys.exit()
 
-    # Generate parse tree
-    parse_tree = Parser()
-    parse_tree = parse_tree.startParsing(tokenizer)
+    # Optimize parse tree, cached programs were optimized when first compiled
+    if args.optimize and interpreter.program is not None and interpreter.eliminated is None:
+        interpreter.optimize()
+    if interpreter.eliminated is not None:
+        print('Optimizer eliminated %d nodes' % interpreter.eliminated, file=sys.stderr)
+    if args.report_checks and interpreter.sites is not None:
+        print(formatSites(interpreter.sites), file=sys.stderr)
+    if cache is not None:
+        print(formatStats(cache), file=sys.stderr)
 
     # Print program
-    parse_tree.printProgram()
+    if args.mode != 'run':
+        interpreter.printProgram()
 
     # Execute program
-    print('\n**** Output ****')
-    parse_tree.execProgram()
+    if args.mode != 'print':
+        if args.mode == 'both':
+            print('\n**** Output ****')
+        try:
+            inputs = BulkInput(args.input) if args.input else None
+        except CoreError as error:
+            print('Error: ' + error.message)
+            sys.exit()
+        except OSError as error:
+            print('Error: ' + str(error))
+            sys.exit()
+        if args.output:
+            with open(args.output, 'w') as f:
+                execute(interpreter, args, inputs, BufferedOutput(f))
+        else:
+            execute(interpreter, args, inputs)
+        if results is not None:
+            print(formatStats(results), file=sys.stderr)
+
+    if metrics is not None:
+        writeMetrics(metrics, args)
+
+
+# Runs the program as the command line asks, with the profiler if requested
+def execute(interpreter, args, inputs, output=None):
+    if not args.profile:
+        interpreter.run(inputs, args.engine, output)
+        return
+    rt, profile = interpreter.profile(inputs, output)
+    print(profile.format(PROFILE_LINES), file=sys.stderr)
+    with open(args.profile, 'w') as f:
+        f.write(profile.toJson() + '\n')
+
+
+# Writes the metrics where and how the command line asks
+def writeMetrics(metrics, args):
+    text = metrics.toJson() if args.metrics_format == 'json' else metrics.toPrometheus()
+    if args.metrics == '-':
+        sys.stderr.write(text)
+        return
+    with open(args.metrics, 'w') as f:
+        f.write(text)
 
 
 if __name__ == '__main__':
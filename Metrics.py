@@ -0,0 +1,64 @@
+# Metrics for Core Interpreter
+# Counters and timings of each phase, for sizing workloads: tokenizing,
+# parsing and execution. They are read from the counters the tokenizers, the
+# parser and the runtime state keep anyway, so collecting them costs next to
+# nothing. Totals add up over every program an Interpreter given the Metrics
+# parses and runs, and are exported as JSON or Prometheus text format
+# Author: Wilmer Pellicier
+import json
+
+# Metrics collected, in report order, with their help text
+METRICS = (
+    ('tokens', 'Tokens produced by the tokenizer'),
+    ('tokenize_seconds', 'Seconds spent tokenizing'),
+    ('nodes', 'Parse tree nodes built by the parser'),
+    ('parse_seconds', 'Seconds spent parsing, not counting the tokenizer'),
+    ('runs', 'Programs run'),
+    ('statements', 'Statements executed'),
+    ('iterations', 'Loop iterations'),
+    ('reads', 'Values read'),
+    ('writes', 'Values written'),
+    ('execute_seconds', 'Seconds spent executing'),
+)
+# Prefix of every metric name in Prometheus text format
+PROMETHEUS_PREFIX = 'core_'
+
+
+# Class for Metrics. The totals of every metric, by name
+class Metrics:
+    def __init__(self):
+        self.values = dict.fromkeys([name for name, _ in METRICS], 0)
+
+    # Records the parse by parser from the tokens of tokenizer
+    def recordParse(self, tokenizer, parser):
+        values = self.values
+        values['tokens'] += tokenizer.produced
+        values['tokenize_seconds'] += tokenizer.time
+        values['nodes'] += parser.nodes
+        values['parse_seconds'] += parser.time
+
+    # Records a run that finished with runtime state rt, passing lines lines
+    # to its output in seconds. Replayed runs only read and write
+    def recordRun(self, rt, lines, seconds):
+        values = self.values
+        values['runs'] += 1
+        values['statements'] += rt.steps
+        values['iterations'] += rt.iterations
+        values['reads'] += rt.reads
+        # The line reporting a runtime error is not a write
+        values['writes'] += lines - (rt.error is not None)
+        values['execute_seconds'] += seconds
+
+    # Returns the metrics as JSON
+    def toJson(self):
+        return json.dumps(self.values, indent=2) + '\n'
+
+    # Returns the metrics in Prometheus text format, every one a counter
+    def toPrometheus(self):
+        lines = []
+        for name, text in METRICS:
+            metric = PROMETHEUS_PREFIX + name + '_total'
+            lines.append('# HELP %s %s' % (metric, text))
+            lines.append('# TYPE %s counter' % metric)
+            lines.append('%s %s' % (metric, self.values[name]))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,300 @@
+# Optimizer for Core Interpreter
+# Rewrites a parse tree in place before it is run. Constant expressions and
+# comparisons are folded, identities such as X * 1, X + 0 and X * 0 are
+# dropped, parenthesized chains are merged into the enclosing one, and if
+# statements and loops whose condition is known are pruned.
+# Reading an identifier fails when it is not initialized, so such reads are
+# only dropped where the identifier is known to hold a value
+# Author: Wilmer Pellicier
+import operator
+
+from Parser import Fac, Op
+
+
+# Comparison functions by operator. A token that is not a comparison operator
+# compares as None, which is never true
+COMPARISONS = {'!=': operator.ne, '==': operator.eq, '<': operator.lt,
+               '>': operator.gt, '<=': operator.le, '>=': operator.ge,
+               None: lambda left, right: False}
+
+
+# Optimizes prog in place
+# Returns the number of parse tree nodes eliminated
+def optimizeProgram(prog):
+    before = countNodes(prog)
+    optimizer = Optimizer(ident for decl in prog.decl_seq.decls for ident in decl.idList.ids)
+    optimizer.optimizeStmtSeq(prog.stmt_seq, set())
+    return before - countNodes(prog)
+
+
+# Returns an operand holding the constant value
+def constOp(value):
+    op = Op()
+    op.altNo = 0
+    op.value = value
+    return op
+
+
+# Returns a factor holding the constant value
+def constFac(value):
+    fac = Fac()
+    fac.ops = [constOp(value)]
+    return fac
+
+
+# Returns the facs of exp paired with whether each one is subtracted
+def signedFacs(exp):
+    return zip(exp.facs, [False] + exp.negations())
+
+
+# Class for Optimizer. Walks statements in program order, tracking the
+# identifiers that are certainly holding a value at each point
+class Optimizer:
+    def __init__(self, declared):
+        self.declared = set(declared)
+
+    # Optimizes statement sequence, starting with the identifiers in safe
+    # Returns the identifiers safe to read after the sequence
+    def optimizeStmtSeq(self, stmt_seq, safe):
+        stmts = []
+        for stmt in stmt_seq.stmts:
+            safe = self.optimizeStmt(stmt, safe, stmts)
+        stmt_seq.stmts = stmts
+        return safe
+
+    # Optimizes statement, appending what is left of it to stmts
+    # Returns the identifiers safe to read after the statement
+    def optimizeStmt(self, stmt, safe, stmts):
+        if stmt.altNo == 0:   # Case <assign>
+            assign = stmt.assign
+            self.foldExp(assign.exp, safe)
+            stmts.append(stmt)
+            if assign.id in self.declared:
+                return safe | {assign.id}
+            return safe
+        elif stmt.altNo == 1:   # Case <if>
+            if_stmt = stmt.if_stmt
+            value = self.foldCond(if_stmt.c, safe)
+            if value is True:
+                return self.spliceStmtSeq(if_stmt.stmtSeq1, safe, stmts)
+            if value is False:
+                if if_stmt.altNo == 1:
+                    return self.spliceStmtSeq(if_stmt.stmtSeq2, safe, stmts)
+                return safe
+            stmts.append(stmt)
+            then_safe = self.optimizeStmtSeq(if_stmt.stmtSeq1, safe)
+            if if_stmt.altNo == 0:
+                return safe
+            return then_safe & self.optimizeStmtSeq(if_stmt.stmtSeq2, safe)
+        elif stmt.altNo == 2:   # Case <loop>
+            loop = stmt.loop
+            if self.foldCond(loop.c, safe) is False:
+                return safe
+            stmts.append(stmt)
+            self.optimizeStmtSeq(loop.stmt_seq, safe)
+            return safe
+        elif stmt.altNo == 3:   # Case <in>
+            stmts.append(stmt)
+            return safe | (set(stmt.in_stmt.idList.ids) & self.declared)
+        else:   # Case <out>, a write only succeeds on initialized identifiers
+            stmts.append(stmt)
+            return safe | set(stmt.out_stmt.idList.ids)
+
+    # Optimizes the statements of stmt_seq, appending them to stmts
+    # Returns the identifiers safe to read after them
+    def spliceStmtSeq(self, stmt_seq, safe, stmts):
+        safe = self.optimizeStmtSeq(stmt_seq, safe)
+        stmts.extend(stmt_seq.stmts)
+        return safe
+
+    # Simplifies condition in place
+    # Returns its value when it is known, None otherwise
+    def foldCond(self, cond, safe):
+        if cond.altNo == 0:
+            comp = cond.comp
+            left = self.foldOp(comp.op1, safe)
+            right = self.foldOp(comp.op2, safe)
+            if left is None or right is None:
+                return None
+            return COMPARISONS[comp.comp_op.getCompOp()](left, right)
+        elif cond.altNo == 1:
+            value = self.foldCond(cond.not_cond, safe)
+            return None if value is None else not value
+
+        left = self.foldCond(cond.left_cond, safe)
+        right = self.foldCond(cond.right_cond, safe)
+        if left is not None and right is not None:
+            return left and right if cond.altNo == 2 else left or right
+
+        # Both sides are always evaluated, so a side deciding the result only
+        # replaces the condition when the other side cannot fail
+        deciding = cond.altNo == 3
+        if left is deciding and self.isSafeCond(cond.right_cond, safe):
+            return deciding
+        if right is deciding and self.isSafeCond(cond.left_cond, safe):
+            return deciding
+        if left is not None and left != deciding:   # [true && C] or [false || C]
+            replaceCond(cond, cond.right_cond)
+        elif right is not None and right != deciding:
+            replaceCond(cond, cond.left_cond)
+        return None
+
+    # Folds expression in place
+    # Returns its value when it is constant, None otherwise
+    def foldExp(self, exp, safe):
+        terms = []   # (fac, subtracted) left after folding
+        total = 0
+        for fac, negative in signedFacs(exp):
+            value = self.foldFac(fac, safe)
+            if value is not None:
+                total += -value if negative else value
+            elif len(fac.ops) == 1 and fac.ops[0].altNo == 2:   # (<exp>), merged
+                for inner, inner_negative in signedFacs(fac.ops[0].exp):
+                    if len(inner.ops) == 1 and inner.ops[0].altNo == 0:
+                        value = inner.ops[0].int_obj
+                        total += -value if inner_negative != negative else value
+                    else:
+                        terms.append((inner, inner_negative != negative))
+            else:
+                terms.append((fac, negative))
+
+        if not terms:
+            exp.facs = [constFac(total)]
+            exp.operators = ()
+            return total
+
+        if total != 0:
+            terms.append((constFac(abs(total)), total < 0))
+        if terms[0][1]:   # the first fac cannot be subtracted
+            first = next((i for i, term in enumerate(terms) if not term[1]), None)
+            if first is None:
+                terms.insert(0, (constFac(0), False))
+            else:
+                terms.insert(0, terms.pop(first))
+
+        exp.facs = [fac for fac, negative in terms]
+        operators = []
+        previous = False
+        for fac, negative in terms[1:]:
+            operators.append('-' if negative != previous else '+')
+            previous = negative
+        exp.operators = tuple(operators)
+        return None
+
+    # Folds factor in place
+    # Returns its value when it is constant, None otherwise
+    def foldFac(self, fac, safe):
+        ops = []
+        product = 1
+        for op in fac.ops:
+            value = self.foldOp(op, safe)
+            if value is not None:
+                product *= value
+            elif op.altNo == 2 and len(op.exp.facs) == 1:   # (<fac>), merged
+                for inner in op.exp.facs[0].ops:
+                    if inner.altNo == 0:
+                        product *= inner.int_obj
+                    else:
+                        ops.append(inner)
+            else:
+                ops.append(op)
+
+        if not ops or product == 0 and all(self.isSafeOp(op, safe) for op in ops):
+            fac.ops = [constOp(product)]
+            return product
+        if product != 1:
+            ops.append(constOp(product))
+        fac.ops = ops
+        return None
+
+    # Folds operand in place
+    # Returns its value when it is constant, None otherwise
+    def foldOp(self, op, safe):
+        if op.altNo == 0:
+            return op.int_obj
+        elif op.altNo == 1:
+            return None
+
+        value = self.foldExp(op.exp, safe)
+        if value is not None:
+            op.altNo = 0
+            op.value = value
+        elif len(op.exp.facs) == 1 and len(op.exp.facs[0].ops) == 1:   # drop ( )
+            inner = op.exp.facs[0].ops[0]
+            op.altNo = inner.altNo
+            op.value = inner.value
+        return value
+
+    # Checks if evaluating cond can never fail
+    def isSafeCond(self, cond, safe):
+        if cond.altNo == 0:
+            return self.isSafeOp(cond.comp.op1, safe) and self.isSafeOp(cond.comp.op2, safe)
+        elif cond.altNo == 1:
+            return self.isSafeCond(cond.not_cond, safe)
+        return self.isSafeCond(cond.left_cond, safe) and self.isSafeCond(cond.right_cond, safe)
+
+    # Checks if evaluating op can never fail
+    def isSafeOp(self, op, safe):
+        if op.altNo == 0:
+            return True
+        elif op.altNo == 1:
+            return op.id in safe
+        return all(self.isSafeOp(inner, safe) for fac in op.exp.facs for inner in fac.ops)
+
+
+# Makes cond a copy of other
+def replaceCond(cond, other):
+    cond.altNo = other.altNo
+    cond.left = other.left
+    cond.right = other.right
+
+
+# Returns the number of parse tree nodes below the declarations of prog
+def countNodes(prog):
+    return countStmtSeq(prog.stmt_seq)
+
+
+# Counts statement sequence nodes
+def countStmtSeq(stmt_seq):
+    return 1 + sum(countStmt(stmt) for stmt in stmt_seq.stmts)
+
+
+# Counts statement nodes, the statement and the node it wraps
+def countStmt(stmt):
+    if stmt.altNo == 0:   # Case <assign>
+        return 2 + countExp(stmt.assign.exp)
+    elif stmt.altNo == 1:   # Case <if>
+        if_stmt = stmt.if_stmt
+        count = 2 + countCond(if_stmt.c) + countStmtSeq(if_stmt.stmtSeq1)
+        if if_stmt.altNo == 1:
+            count += countStmtSeq(if_stmt.stmtSeq2)
+        return count
+    elif stmt.altNo == 2:   # Case <loop>
+        return 2 + countCond(stmt.loop.c) + countStmtSeq(stmt.loop.stmt_seq)
+    return 2   # Case <in> or <out>
+
+
+# Counts condition nodes
+def countCond(cond):
+    if cond.altNo == 0:
+        return 2 + countOp(cond.comp.op1) + countOp(cond.comp.op2)
+    elif cond.altNo == 1:
+        return 1 + countCond(cond.not_cond)
+    return 1 + countCond(cond.left_cond) + countCond(cond.right_cond)
+
+
+# Counts expression nodes
+def countExp(exp):
+    return 1 + sum(countFac(fac) for fac in exp.facs)
+
+
+# Counts factor nodes
+def countFac(fac):
+    return 1 + sum(countOp(op) for op in fac.ops)
+
+
+# Counts operand nodes
+def countOp(op):
+    if op.altNo == 2:
+        return 1 + countExp(op.exp)
+    return 1
@@ -0,0 +1,81 @@
+# Output sinks for Core Interpreter
+# Every run hands the lines of its write statements, and its runtime error
+# message if any, to an output sink. Sinks have two methods:
+#   write(line)   takes one line of output, without its newline
+#   flush()       passes on whatever is still held
+# Author: Wilmer Pellicier
+import sys
+
+# Lines a buffered sink collects before writing them out
+BUFFER_LINES = 4096
+
+
+# Class for Buffered Output. Collects lines and writes them to a text stream
+# in large blocks
+class BufferedOutput:
+    # Parameter stream is written to, when omitted the standard output of
+    # the moment each block is written
+    def __init__(self, stream=None, buffer_lines=BUFFER_LINES):
+        self.stream = stream
+        self.buffer_lines = buffer_lines
+        self.lines = []
+
+    # Adds a line of output
+    def write(self, line):
+        self.lines.append(line)
+        if len(self.lines) >= self.buffer_lines:
+            self.flush()
+
+    # Writes out the lines collected so far
+    def flush(self):
+        stream = sys.stdout if self.stream is None else self.stream
+        if self.lines:
+            stream.write('\n'.join(self.lines) + '\n')
+            self.lines = []
+        stream.flush()
+
+
+# Class for List Output. Keeps every line in memory, for callers that want
+# the output of a run without any terminal I/O
+class ListOutput:
+    def __init__(self):
+        self.lines = []
+        self.write = self.lines.append   # Adds a line of output
+
+    # Nothing is held back
+    def flush(self):
+        pass
+
+
+# Class for Recording Output. Passes every line on to another sink and keeps
+# a copy of it, for callers that need the output of a run as well as showing it
+class RecordingOutput:
+    def __init__(self, sink):
+        self.sink = sink
+        self.lines = []
+
+    # Adds a line of output
+    def write(self, line):
+        self.lines.append(line)
+        self.sink.write(line)
+
+    # Passes on whatever the sink still holds
+    def flush(self):
+        self.sink.flush()
+
+
+# Class for Counting Output. Passes every line on to another sink, counting
+# the lines that went through
+class CountingOutput:
+    def __init__(self, sink):
+        self.sink = sink
+        self.count = 0
+
+    # Adds a line of output
+    def write(self, line):
+        self.count += 1
+        self.sink.write(line)
+
+    # Passes on whatever the sink still holds
+    def flush(self):
+        self.sink.flush()
@@ -1,627 +1,695 @@
 # Parser class for Core Interpreter
 # Allows for parsing, printing, and executing
+# Nodes use __slots__ and keep a single field for the child of whichever
+# alternative they hold, so a large program costs little memory per node.
+# The usual child names (stmt.assign, cond.comp, op.id, ...) remain
+# available as read only properties
 # Author: Wilmer Pellicier
 import sys
+import time
+from Runtime import Runtime
+from Errors import CoreError
+
+
+# Returns a read only property giving field when the altNo of the node is
+# one of alt_nos, and None otherwise
+def alternative(field, *alt_nos):
+    def get(self):
+        return getattr(self, field) if self.altNo in alt_nos else None
+    return property(get)
+
+
+# Shared empty set of proven IDs, for write statements not analyzed
+NOTHING_PROVEN = frozenset()
 
 
 class Parser:
     # Constructor for Parser, starts generating parse tree
     def __init__(self):
-        pass
+        self.time = 0.0   # seconds the last parse took, not counting the tokenizer
+        self.nodes = 0    # nodes the last parse built, each ID counted once
+        self.symbols = None   # symbol table of the last parse
 
+    # Each parse method is handed the parser, holding the symbol table of
+    # the parse in symbols, and counts the node it builds in nodes
     def startParsing(self, tokenizer):
+        start = time.perf_counter()
+        lexed = tokenizer.time
+        # Each parse gets its own symbol table
+        self.symbols = SymbolTable()
+        self.nodes = 0
+
         # Starts parsing from program keyword
         pt = Prog()
-        pt.parseProg(tokenizer)
+        pt.parseProg(tokenizer, self)
+        self.symbols.declareRemaining()
+        pt.symbols = self.symbols
+        self.time = time.perf_counter() - start - (tokenizer.time - lexed)
         return pt
 
 
 # Class for Program node. Allows for parsing, printing, and executing
 class Prog:
+    __slots__ = ('decl_seq', 'stmt_seq', 'symbols')
+
     def __init__(self):
         self.decl_seq = None
         self.stmt_seq = None
+        self.symbols = None
 
     # Parses program node
-    def parseProg(self, tokenizer):
+    def parseProg(self, tokenizer, parser):
+        parser.nodes += 1
         t = tokenizer.getToken()
         if t[0] != 1:  # Should be 'program'
-            print('Error: Keyword did not match "program"')
-            sys.exit()
+            raise CoreError('Keyword did not match "program"')
         tokenizer.skipToken()
 
         self.decl_seq = DeclSeq()
-        self.decl_seq.parseDeclSeq(tokenizer)
+        self.decl_seq.parseDeclSeq(tokenizer, parser)
 
         t = tokenizer.getToken()
         if t[0] != 2:  # Should be 'begin'
-            print('Error: Keyword did not match "begin"')
-            sys.exit()
+            raise CoreError('Keyword did not match "begin"')
         tokenizer.skipToken()
 
         self.stmt_seq = StmtSeq()
-        self.stmt_seq.parseStmtSeq(tokenizer)
+        self.stmt_seq.parseStmtSeq(tokenizer, parser)
 
         t = tokenizer.getToken()
         if t[0] != 3:  # Should be 'end'
-            print('Error: Keyword did not match "end"')
-            sys.exit()
+            raise CoreError('Keyword did not match "end"')
         tokenizer.skipToken()
 
-    # Pretty prints program node
+    # Pretty prints program node, written out in one go
     def printProgram(self):
-        print('program')
-        self.decl_seq.printDeclSeq()
-        print('begin')
-        self.stmt_seq.printStmtSeq(1)
-        print('end')
+        sys.stdout.write(self.renderProgram())
+
+    # Returns the pretty printed program as one string
+    def renderProgram(self):
+        out = []
+        out.append('program\n')
+        self.decl_seq.renderDeclSeq(out)
+        out.append('begin\n')
+        self.stmt_seq.renderStmtSeq(out, 1)
+        out.append('end\n')
+        return ''.join(out)
 
     # Executes program node
-    def execProgram(self):
-        self.decl_seq.execDeclSeq()
-        self.stmt_seq.execStmtSeq()
+    # Parameter rt holds the state of this run, a fresh one is used if omitted
+    def execProgram(self, rt=None):
+        if rt is None:
+            rt = Runtime()
+        rt.allocate(len(self.symbols))
+        self.decl_seq.execDeclSeq(rt)
+        self.stmt_seq.execStmtSeq(rt)
+        rt.output.flush()
 
 
 # Class for Declaration Sequence. Allows for parsing, printing, and executing
+# Declarations are kept in a flat list, parsed and executed with loops
 class DeclSeq:
+    __slots__ = ('decls',)
+
     def __init__(self):
-        self.altNo = 0  # <decl> or <decl><decl seq> ?
-        self.decl = None
-        self.decl_seq = None
+        self.decls = []  # <decl> or <decl><decl seq>
 
     # Parses declaration sequence node
-    def parseDeclSeq(self, tokenizer):
-        self.decl = Decl()
-        self.decl.parseDecl(tokenizer)
+    def parseDeclSeq(self, tokenizer, parser):
+        parser.nodes += 1
+        while True:
+            decl = Decl()
+            decl.parseDecl(tokenizer, parser)
+            self.decls.append(decl)
 
-        t = tokenizer.getToken()
-        if t[0] != 2:  # Haven't hit 'begin'. This is case <decl><decl seq>
-            self.altNo = 1
-            self.decl_seq = DeclSeq()
-            self.decl_seq.parseDeclSeq(tokenizer)
+            t = tokenizer.getToken()
+            if t[0] == 2:  # Hit 'begin', no more declarations
+                break
 
-    # Pretty prints declaration sequence node
-    def printDeclSeq(self):
-        indentation(1)
-        self.decl.printDecl()
-        if self.altNo == 1:
-            self.decl_seq.printDeclSeq()
+    # Pretty prints declaration sequence node, appending the text to out
+    def renderDeclSeq(self, out):
+        for decl in self.decls:
+            out.append(indentation(1))
+            decl.renderDecl(out)
 
     # Executes declaration sequence
-    def execDeclSeq(self):
-        self.decl.execDecl()
-        if self.altNo == 1:
-            self.decl_seq.execDeclSeq()
+    def execDeclSeq(self, rt):
+        for decl in self.decls:
+            decl.execDecl(rt)
 
 
 # Class for Statement Sequence. Allows for parsing, printing, and executing
+# Statements are kept in a flat list, parsed and executed with loops
 class StmtSeq:
+    __slots__ = ('stmts',)
+
     def __init__(self):
-        self.altNo = 0  # <stmt> or <decl><decl seq> ?
-        self.stmt = None
-        self.stmt_seq = None
+        self.stmts = []  # <stmt> or <stmt><stmt seq>
 
     # Parses statement sequence node
-    def parseStmtSeq(self, tokenizer):
-        self.stmt = Stmt()
-        self.stmt.parseStmt(tokenizer)
+    def parseStmtSeq(self, tokenizer, parser):
+        parser.nodes += 1
+        while True:
+            stmt = Stmt()
+            stmt.parseStmt(tokenizer, parser)
+            self.stmts.append(stmt)
 
-        t = tokenizer.getToken()
-        if t[0] != 3 and t[0] != 7:  # Haven't hit 'end'. This is case <stmt><stmt seq>
-            self.altNo = 1
-            self.stmt_seq = StmtSeq()
-            self.stmt_seq.parseStmtSeq(tokenizer)
+            t = tokenizer.getToken()
+            if t[0] == 3 or t[0] == 7:  # Hit 'end' or 'else', no more statements
+                break
 
-    # Pretty prints statement sequence
+    # Pretty prints statement sequence, appending the text to out
     # Parameter i indicates indentation
-    def printStmtSeq(self, i):
-        indentation(i)
-        self.stmt.printStmt(i)
-        if self.altNo == 1:
-            self.stmt_seq.printStmtSeq(i)
+    def renderStmtSeq(self, out, i):
+        for stmt in self.stmts:
+            out.append(indentation(i))
+            stmt.renderStmt(out, i)
 
     # Executes statement sequence
-    def execStmtSeq(self):
-        self.stmt.execStmt()
-        if self.altNo == 1:
-            self.stmt_seq.execStmtSeq()
+    def execStmtSeq(self, rt):
+        rt.steps += len(self.stmts)
+        for stmt in self.stmts:
+            stmt.execStmt(rt)
 
 
 # Class for Declaration. Allows for parsing, printing, and executing
 class Decl:
+    __slots__ = ('idList',)
+
     def __init__(self):
         self.idList = None
 
     # Parses declaration node
-    def parseDecl(self, tokenizer):
+    def parseDecl(self, tokenizer, parser):
+        parser.nodes += 1
         t = tokenizer.getToken()
         if t[0] != 4:  # Should be 'int'
-            print('Error: Keyword did not match "int"')
-            sys.exit()
+            raise CoreError('Keyword did not match "int"')
         tokenizer.skipToken()
 
         self.idList = ID_List()
-        self.idList.parseIdList(tokenizer)
+        self.idList.parseIdList(tokenizer, parser)
+
+        # Give each declared identifier its slot
+        for ident in self.idList.ids:
+            parser.symbols.declare(ident)
 
         t = tokenizer.getToken()
         if t[0] != 12:  # Should be '';''
-            print('Error: Token did not match ";"')
-            sys.exit()
+            raise CoreError('Token did not match ";"')
         tokenizer.skipToken()
 
     # Pretty prints declaration
-    def printDecl(self):
-        print('int', end=' ')
-        self.idList.printIdList()
-        print(';')
+    def renderDecl(self, out):
+        out.append('int ')
+        self.idList.renderIdList(out)
+        out.append(';\n')
 
     # Executes declaration
-    def execDecl(self):
-        self.idList.execIdList()
+    def execDecl(self, rt):
+        self.idList.execIdList(rt)
 
 
 # Class for ID List. Allows for parsing, printing, and executing
+# Identifiers are kept in a flat list, parsed and executed with loops
 class ID_List:
+    __slots__ = ('ids',)
+
     def __init__(self):
-        self.altNo = 0  # <id> or <id>, <id list>
-        self.id = None
-        self.idList = None
+        self.ids = []  # <id> or <id>, <id list>
 
     # Parses ID list node
-    def parseIdList(self, tokenizer):
-        self.id = ID()
-        self.id = self.id.parseID(tokenizer)
+    def parseIdList(self, tokenizer, parser):
+        parser.nodes += 1
+        self.ids.append(ID.parseID(tokenizer, parser))
 
         t = tokenizer.getToken()
-        if t[0] == 13:  # Found ',' indicating more IDs in DS. Case <id>, <id list>
-            self.altNo = 1
+        while t[0] == 13:  # Found ',' indicating more IDs. Case <id>, <id list>
             tokenizer.skipToken()
-            self.idList = ID_List()
-            self.idList.parseIdList(tokenizer)
+            self.ids.append(ID.parseID(tokenizer, parser))
+            t = tokenizer.getToken()
 
     # Pretty prints ID List
-    def printIdList(self):
-        print(self.id.getIDName(), end='')
-        if self.altNo == 1:
-            print(',', end=' ')
-            self.idList.printIdList()
+    def renderIdList(self, out):
+        out.append(', '.join(ident.getIDName() for ident in self.ids))
 
     # Executes ID List
-    def execIdList(self):
-        # Check if ID has already been declared, if so, throw error
-        if self.id.isDeclared():
-            print("Error: " + self.id.getIDName() + " already declared")
-            sys.exit()
-        # Set id to declared
-        self.id.setDeclared()
-        if self.altNo == 1:
-            self.idList.execIdList()
-
-    # Handles reading ID value from standard input stream
-    def execReadIdList(self):
-        if not self.id.isDeclared():
-            print("Error: " + self.id.getIDName() + " not declared")
-            sys.exit()
-        # Get ID value from standard input stream
-        print('\nEnter value for ' + self.id.getIDName() + ':') # Comment this line if not needed
-        self.id.setIdVal(input())
-        self.id.setInitialized()
-
-        # Check if there are more ID waiting for read values
-        if self.altNo == 1:
-            self.idList.execReadIdList()
-
-    # Handles writing ID value to standard output stream
-    def execWriteIdList(self):
-        if not self.id.isDeclared():
-            print("Error: " + self.id.getIDName() + " not declared")
-            sys.exit()
-        if not self.id.isInitialized():
-            print("Error: " + self.id.getIDName() + " not initialized")
-            sys.exit()
-
-        print(self.id.getIDName() + ' = ' + str(self.id.getIdVal()))
-
-        if self.altNo == 1:
-            self.idList.execWriteIdList()
+    def execIdList(self, rt):
+        for ident in self.ids:
+            # Check if ID has already been declared, if so, throw error
+            if ident.isDeclared(rt):
+                rt.fail(ident.getIDName() + " already declared")
+            # Set id to declared
+            ident.setDeclared(rt)
+
+    # Handles reading ID values from the inputs of this run
+    def execReadIdList(self, rt):
+        for ident in self.ids:
+            if not ident.isDeclared(rt):
+                rt.fail(ident.getIDName() + " not declared")
+            ident.setIdVal(rt, rt.readValue(ident.getIDName()))
+
+    # Handles writing ID values to the output of this run
+    # Parameter proven holds the IDs known to be declared and initialized
+    def execWriteIdList(self, rt, proven=()):
+        for ident in self.ids:
+            if ident in proven:
+                rt.output.write(ident.getIDName() + ' = ' + str(ident.getIdValUnchecked(rt)))
+                continue
+            if not ident.isDeclared(rt):
+                rt.fail(ident.getIDName() + " not declared")
+            if not ident.isInitialized(rt):
+                rt.fail(ident.getIDName() + " not initialized")
+
+            rt.output.write(ident.getIDName() + ' = ' + str(ident.getIdVal(rt)))
 
 
 # Class for Statement. Allows for parsing, printing, and executing
 class Stmt:
+    __slots__ = ('altNo', 'child', 'line')
+
     def __init__(self):
         self.altNo = 0  # <assign> or <if> or <loop> or <in> or <out>
-        self.assign = None
-        self.if_stmt = None
-        self.loop = None
-        self.in_stmt = None
-        self.out_stmt = None
+        self.child = None
+        self.line = 0   # source line the statement starts on
+
+    assign = alternative('child', 0)
+    if_stmt = alternative('child', 1)
+    loop = alternative('child', 2)
+    in_stmt = alternative('child', 3)
+    out_stmt = alternative('child', 4)
 
     # Parses statement node
-    def parseStmt(self, tokenizer):
+    def parseStmt(self, tokenizer, parser):
+        parser.nodes += 1
         t = tokenizer.getToken()
+        self.line = tokenizer.lineNo()
 
         if t[0] == 32:   # Case <assign>
             self.altNo = 0
-            self.assign = Assign()
-            self.assign.parseAssign(tokenizer)
+            self.child = Assign()
+            self.child.parseAssign(tokenizer, parser)
         elif t[0] == 5:   # Case <if>
             self.altNo = 1
-            self.if_stmt = If()
-            self.if_stmt.parseIf(tokenizer)
+            self.child = If()
+            self.child.parseIf(tokenizer, parser)
         elif t[0] == 8:   # Case <loop>
             self.altNo = 2
-            self.loop = Loop()
-            self.loop.parseLoop(tokenizer)
+            self.child = Loop()
+            self.child.parseLoop(tokenizer, parser)
         elif t[0] == 10:   # Case <in>
             self.altNo = 3
-            self.in_stmt = InStmt()
-            self.in_stmt.parseInStmt(tokenizer)
+            self.child = InStmt()
+            self.child.parseInStmt(tokenizer, parser)
         elif t[0] == 11:   # Case <out>
             self.altNo = 4
-            self.out_stmt = OutStmt()
-            self.out_stmt.parseOutStmt(tokenizer)
+            self.child = OutStmt()
+            self.child.parseOutStmt(tokenizer, parser)
         else:
-            print('Error: Token did not match statement')
-            sys.exit()
+            raise CoreError('Token did not match statement')
 
         t = tokenizer.getToken()
         if t[0] != 12:  # Should be ';'
-            print('Error: Token did not match ";"')
-            sys.exit()
+            raise CoreError('Token did not match ";"')
         tokenizer.skipToken()
 
     # Pretty print statement
     # Parameter indicates appropriate indentation
-    def printStmt(self, i):
+    def renderStmt(self, out, i):
         if self.altNo == 0:   # Case <assign>
-            self.assign.printAssign()
+            self.child.renderAssign(out)
         elif self.altNo == 1:   # Case <if>
-            self.if_stmt.printIf(i)
+            self.child.renderIf(out, i)
         elif self.altNo == 2:   # Case <loop>
-            self.loop.printLoop(i)
+            self.child.renderLoop(out, i)
         elif self.altNo == 3:   # Case <in>
-            self.in_stmt.printInStmt()
+            self.child.renderInStmt(out)
         elif self.altNo == 4:  # Case <out>
-            self.out_stmt.printOutStmt()
+            self.child.renderOutStmt(out)
 
     # Execute statement
-    def execStmt(self):
+    def execStmt(self, rt):
         if self.altNo == 0:  # Case <assign>
-            self.assign.execAssign()
+            self.child.execAssign(rt)
         elif self.altNo == 1:  # Case <if>
-            self.if_stmt.execIf()
+            self.child.execIf(rt)
         elif self.altNo == 2:  # Case <loop>
-            self.loop.execLoop()
+            self.child.execLoop(rt, self.line)
         elif self.altNo == 3:  # Case <in>
-            self.in_stmt.execInStmt()
+            self.child.execInStmt(rt)
         elif self.altNo == 4:  # <out>
-            self.out_stmt.execOutStmt()
+            self.child.execOutStmt(rt)
 
 
 # Class for Assign. Allows for parsing, printing, and executing
 class Assign:
+    __slots__ = ('id', 'exp')
+
     def __init__(self):
         self.id = None
         self.exp = None
 
     # Parses assign node
-    def parseAssign(self, tokenizer):
+    def parseAssign(self, tokenizer, parser):
+        parser.nodes += 1
         t = tokenizer.getToken()
         if t[0] != 32:  # Should be identifier
-            print("Error: Token is not an identifier")
-            sys.exit()
-        self.id = ID()
-        self.id = self.id.parseID(tokenizer)
+            raise CoreError("Token is not an identifier")
+        self.id = ID.parseID(tokenizer, parser)
 
         t = tokenizer.getToken()
         if t[0] != 14:  # Should be '='
-            print('Error: Token did not match "="')
-            sys.exit()
+            raise CoreError('Token did not match "="')
 
         tokenizer.skipToken()
 
         self.exp = Exp()
-        self.exp.parseExp(tokenizer)
+        self.exp.parseExp(tokenizer, parser)
 
     # Pretty prints assign
-    def printAssign(self):
-        print(self.id.name + ' =', end=' ')
-        self.exp.printExp()
-        print(';')
+    def renderAssign(self, out):
+        out.append(self.id.name + ' = ')
+        self.exp.renderExp(out)
+        out.append(';\n')
 
     # Executes assignment
-    def execAssign(self):
-        if self.id.isDeclared():
-            self.id.setIdVal(self.exp.execExp())
-            self.id.setInitialized()
+    def execAssign(self, rt):
+        if self.id.isDeclared(rt):
+            self.id.setIdVal(rt, self.exp.execExp(rt))
 
 
 # Class for If. Allows for parsing, printing, and executing
 class If:
+    __slots__ = ('c', 'stmtSeq1', 'stmtSeq2')
+
     def __init__(self):
-        self.altNo = 0  # if-then or if-then-else
         self.c = None
         self.stmtSeq1 = None
-        self.stmtSeq2 = None
+        self.stmtSeq2 = None   # only for if-then-else
+
+    # 0 for if-then, 1 for if-then-else
+    @property
+    def altNo(self):
+        return 0 if self.stmtSeq2 is None else 1
 
     # Parses if node
-    def parseIf(self, tokenizer):
+    def parseIf(self, tokenizer, parser):
+        parser.nodes += 1
         t = tokenizer.getToken()
         if t[0] != 5:  # should be 'if'
-            print('Error: Keyword does not match "if"')
-            sys.exit()
+            raise CoreError('Keyword does not match "if"')
         tokenizer.skipToken()
 
         self.c = Cond()
-        self.c.parseCond(tokenizer)
+        self.c.parseCond(tokenizer, parser)
 
         t = tokenizer.getToken()
         if t[0] != 6:  # should be "then"
-            print('Error: Keyword does not match "then"')
-            sys.exit()
+            raise CoreError('Keyword does not match "then"')
         tokenizer.skipToken()
 
         self.stmtSeq1 = StmtSeq()
-        self.stmtSeq1.parseStmtSeq(tokenizer)
+        self.stmtSeq1.parseStmtSeq(tokenizer, parser)
 
         t = tokenizer.getToken()
         if t[0] == 7:  # Case if <cond> then <stmt seq> else <stmt seq> end;
-            self.altNo = 1
             tokenizer.skipToken()
             self.stmtSeq2 = StmtSeq()
-            self.stmtSeq2.parseStmtSeq(tokenizer)
+            self.stmtSeq2.parseStmtSeq(tokenizer, parser)
 
         t = tokenizer.getToken()
         if t[0] != 3:  # Should be 'end'
-            print('Error: Keyword did not match "end"')
-            sys.exit()
+            raise CoreError('Keyword did not match "end"')
         tokenizer.skipToken()
 
     # Pretty prints if statement
-    def printIf(self, i):
-        print('if', end=' ')
-        self.c.printCond()
-        print('then')
-        self.stmtSeq1.printStmtSeq(i + 1)
-        if self.altNo == 1:
-            indentation(i)
-            print('else')
-            self.stmtSeq2.printStmtSeq(i + 1)
-        indentation(i)
-        print('end;')
+    def renderIf(self, out, i):
+        out.append('if ')
+        self.c.renderCond(out)
+        out.append('then\n')
+        self.stmtSeq1.renderStmtSeq(out, i + 1)
+        if self.stmtSeq2 is not None:
+            out.append(indentation(i))
+            out.append('else\n')
+            self.stmtSeq2.renderStmtSeq(out, i + 1)
+        out.append(indentation(i))
+        out.append('end;\n')
 
     # Executes if statement
-    def execIf(self):
-        if self.c.execCond():
-            self.stmtSeq1.execStmtSeq()
-        elif self.altNo == 1:
-            self.stmtSeq2.execStmtSeq()
+    def execIf(self, rt):
+        if self.c.execCond(rt):
+            self.stmtSeq1.execStmtSeq(rt)
+        elif self.stmtSeq2 is not None:
+            self.stmtSeq2.execStmtSeq(rt)
 
 
 # Class for Loop. Allows for parsing, printing, and executing
 class Loop:
+    __slots__ = ('c', 'stmt_seq')
+
     def __init__(self):
         self.c = None
         self.stmt_seq = None
 
     # Parses loop node
-    def parseLoop(self, tokenizer):
+    def parseLoop(self, tokenizer, parser):
+        parser.nodes += 1
         t = tokenizer.getToken()
         if t[0] != 8:  # should be 'while'
-            print('Error: Keyword does not match "while"')
-            sys.exit()
+            raise CoreError('Keyword does not match "while"')
         tokenizer.skipToken()
 
         self.c = Cond()
-        self.c.parseCond(tokenizer)
+        self.c.parseCond(tokenizer, parser)
 
         t = tokenizer.getToken()
         if t[0] != 9:  # should be 'loop'
-            print('Error: Keyword does not match "loop"')
-            sys.exit()
+            raise CoreError('Keyword does not match "loop"')
         tokenizer.skipToken()
 
         self.stmt_seq = StmtSeq()
-        self.stmt_seq.parseStmtSeq(tokenizer)
+        self.stmt_seq.parseStmtSeq(tokenizer, parser)
 
         t = tokenizer.getToken()
         if t[0] != 3:  # Should be 'end'
-            print('Error: Keyword did not match "end"')
-            sys.exit()
+            raise CoreError('Keyword did not match "end"')
         tokenizer.skipToken()
 
     # Pretty prints loop
     # Parameter i indicates appropriate indentation
-    def printLoop(self, i):
-        print('while', end=' ')
-        self.c.printCond()
-        print('loop')
-        self.stmt_seq.printStmtSeq(i + 1)
-        print('end;')
-
-    # Executes loop
-    def execLoop(self):
-        while self.c.execCond():
-            self.stmt_seq.execStmtSeq()
+    def renderLoop(self, out, i):
+        out.append('while ')
+        self.c.renderCond(out)
+        out.append('loop\n')
+        self.stmt_seq.renderStmtSeq(out, i + 1)
+        out.append('end;\n')
+
+    # Executes loop, checking the limits of the run as each iteration starts
+    # Parameter line is the source line of the loop statement
+    def execLoop(self, rt, line=0):
+        while self.c.execCond(rt):
+            rt.iterations += 1
+            if rt.iterations >= rt.check_at or rt.steps > rt.max_steps:
+                rt.checkLimits(line, rt.steps, rt.iterations)
+            self.stmt_seq.execStmtSeq(rt)
 
 
 # Class for In. Allows for parsing, printing, and executing
 class InStmt:
+    __slots__ = ('idList',)
+
     def __init__(self):
         self.idList = None
 
     # Parses in node
-    def parseInStmt(self, tokenizer):
+    def parseInStmt(self, tokenizer, parser):
+        parser.nodes += 1
         t = tokenizer.getToken()
         if t[0] != 10:  # should be 'read'
-            print('Error: Keyword does not match "read"')
-            sys.exit()
+            raise CoreError('Keyword does not match "read"')
         tokenizer.skipToken()
 
         self.idList = ID_List()
-        self.idList.parseIdList(tokenizer)
+        self.idList.parseIdList(tokenizer, parser)
 
     # Pretty prints read statement
-    def printInStmt(self):
-        print('read', end=' ')
-        self.idList.printIdList()
-        print(';')
+    def renderInStmt(self, out):
+        out.append('read ')
+        self.idList.renderIdList(out)
+        out.append(';\n')
 
     # Executes read statement
-    def execInStmt(self):
-        self.idList.execReadIdList()
+    def execInStmt(self, rt):
+        self.idList.execReadIdList(rt)
 
 
 # Class for Out. Allows for parsing, printing, and executing
 class OutStmt:
+    __slots__ = ('idList', 'proven')
+
     def __init__(self):
         self.idList = None
+        self.proven = NOTHING_PROVEN   # IDs the analysis proved declared and initialized
 
     # Parses out node
-    def parseOutStmt(self, tokenizer):
+    def parseOutStmt(self, tokenizer, parser):
+        parser.nodes += 1
         t = tokenizer.getToken()
         if t[0] != 11:  # should be 'write'
-            print('Error: Keyword does not match "write"')
-            sys.exit()
+            raise CoreError('Keyword does not match "write"')
         tokenizer.skipToken()
 
         self.idList = ID_List()
-        self.idList.parseIdList(tokenizer)
+        self.idList.parseIdList(tokenizer, parser)
 
     # Pretty prints write statement
-    def printOutStmt(self):
-        print('write', end=' ')
-        self.idList.printIdList()
-        print(';')
+    def renderOutStmt(self, out):
+        out.append('write ')
+        self.idList.renderIdList(out)
+        out.append(';\n')
 
     # Executes write statement
-    def execOutStmt(self):
-        self.idList.execWriteIdList()
+    def execOutStmt(self, rt):
+        self.idList.execWriteIdList(rt, self.proven)
 
 
 # Class for Cond. Allows for parsing, printing, and executing
+# left holds the <comp>, the negated <cond> or the left <cond> of && and ||,
+# right holds the right <cond> of && and ||
 class Cond:
+    __slots__ = ('altNo', 'left', 'right')
+
     def __init__(self):
         self.altNo = 0  # <comp> or !<comd> or [<cond>&&<cond>] || [<cond>&&<cond>]
-        self.comp = None
-        self.not_cond = None
-        self.left_cond = None
-        self.right_cond = None
-        self.operator = None
+        self.left = None
+        self.right = None
+
+    comp = alternative('left', 0)
+    not_cond = alternative('left', 1)
+    left_cond = alternative('left', 2, 3)
+    right_cond = alternative('right', 2, 3)
+
+    # '&&' or '||' for those alternatives, None otherwise
+    @property
+    def operator(self):
+        return (None, None, '&&', '||')[self.altNo]
 
     # Parses condition node
-    def parseCond(self, tokenizer):
+    def parseCond(self, tokenizer, parser):
+        parser.nodes += 1
         t = tokenizer.getToken()
         if t[0] == 15:  # !<cond>
             self.altNo = 1
             tokenizer.skipToken()
-            self.not_cond = Cond()
-            self.not_cond.parseCond(tokenizer)
+            self.left = Cond()
+            self.left.parseCond(tokenizer, parser)
         elif t[0] == 16:  # '[' indicates start of && or ||
             tokenizer.skipToken()
-            self.left_cond = Cond()
-            self.left_cond.parseCond(tokenizer)
+            self.left = Cond()
+            self.left.parseCond(tokenizer, parser)
 
             t = tokenizer.getToken()
             if t[0] == 18:  # [<cond> && <cond>]
                 self.altNo = 2
-                self.operator = '&&'
                 tokenizer.skipToken()
             elif t[0] == 19:  # [<cond> || <cond>]
                 self.altNo = 3
-                self.operator = '||'
                 tokenizer.skipToken()
             else:
-                print('Error: Token does not match "&&" or "||"')
-                sys.exit()
+                raise CoreError('Token does not match "&&" or "||"')
             # parsing right hand condition
-            self.right_cond = Cond()
-            self.right_cond.parseCond(tokenizer)
+            self.right = Cond()
+            self.right.parseCond(tokenizer, parser)
             tokenizer.skipToken()
             t = tokenizer.getToken()
         else:  # <comp>
             self.altNo = 0
-            self.comp = Comp()
-            self.comp.parseComp(tokenizer)
+            self.left = Comp()
+            self.left.parseComp(tokenizer, parser)
 
     # Pretty prints condition
-    def printCond(self):
+    def renderCond(self, out):
         if self.altNo == 0:
-            self.comp.printComp()
+            self.left.renderComp(out)
         elif self.altNo == 1:
-            print('!', end='')
-            self.not_cond.printCond()
+            out.append('!')
+            self.left.renderCond(out)
         elif self.altNo == 2:
-            print('[', end=' ')
-            self.left_cond.printCond()
-            print('&&', end=' ')
-            self.right_cond.printCond()
-            print(']', end=' ')
+            out.append('[ ')
+            self.left.renderCond(out)
+            out.append('&& ')
+            self.right.renderCond(out)
+            out.append('] ')
         elif self.altNo == 3:
-            print('[', end='')
-            self.left_cond.printCond()
-            print('||', end=' ')
-            self.right_cond.printCond()
-            print(']', end=' ')
-
-    # Executes condition
-    def execCond(self):
+            out.append('[')
+            self.left.renderCond(out)
+            out.append('|| ')
+            self.right.renderCond(out)
+            out.append('] ')
+
+    # Executes condition. Both sides of && and || are evaluated unless the
+    # run is in short circuit mode
+    def execCond(self, rt):
         if self.altNo == 0:
-            return self.comp.execComp()
+            return self.left.execComp(rt)
         elif self.altNo == 1:
-            return not self.not_cond.execCond()
+            return not self.left.execCond(rt)
+        elif rt.short_circuit:
+            if self.altNo == 2:
+                return self.left.execCond(rt) and self.right.execCond(rt)
+            return self.left.execCond(rt) or self.right.execCond(rt)
         elif self.altNo == 2:
-            left = self.left_cond.execCond()
-            right = self.right_cond.execCond()
+            left = self.left.execCond(rt)
+            right = self.right.execCond(rt)
             return left and right
         elif self.altNo == 3:
-            left = self.left_cond.execCond()
-            right = self.right_cond.execCond()
+            left = self.left.execCond(rt)
+            right = self.right.execCond(rt)
             return left or right
 
 
 # Class for Comp. Allows for parsing, printing, and executing
 class Comp:
+    __slots__ = ('op1', 'comp_op', 'op2')
+
     def __init__(self):
         self.op1 = None
         self.comp_op = None
         self.op2 = None
 
     # Parses comparison node
-    def parseComp(self, tokenizer):
+    def parseComp(self, tokenizer, parser):
+        parser.nodes += 1
         t = tokenizer.getToken()
         if t[0] != 20:  # opening parenthesis
-            print("Error: Token does not match '('")
-            sys.exit()
+            raise CoreError("Token does not match '('")
         tokenizer.skipToken()
 
         self.op1 = Op()
-        self.op1.parseOp(tokenizer)
+        self.op1.parseOp(tokenizer, parser)
 
-        self.comp_op = CompOp()
-        self.comp_op.parseCompOp(tokenizer)
+        self.comp_op = CompOp.parseCompOp(tokenizer)
 
         self.op2 = Op()
-        self.op2.parseOp(tokenizer)
+        self.op2.parseOp(tokenizer, parser)
 
         t = tokenizer.getToken()
         if t[0] != 21:  # closing parenthesis
-            print("Error: Token does not match ')'")
-            sys.exit()
+            raise CoreError("Token does not match ')'")
         tokenizer.skipToken()
 
     # Pretty prints comparison
-    def printComp(self):
-        print('(', end=' ')
-        self.op1.printOp()
-        self.comp_op.printCompOp()
-        self.op2.printOp()
-        print(')', end=' ')
+    def renderComp(self, out):
+        out.append('( ')
+        self.op1.renderOp(out)
+        self.comp_op.renderCompOp(out)
+        self.op2.renderOp(out)
+        out.append(') ')
 
     # Executes comparison
-    def execComp(self):
-        left = self.op1.execOp()
-        right = self.op2.execOp()
+    def execComp(self, rt):
+        left = self.op1.execOp(rt)
+        right = self.op2.execOp(rt)
         comp = self.comp_op.getCompOp()
 
         if comp == '!=':
@@ -641,269 +709,311 @@ class Comp:
 
 # Class for Exp. Allows for parsing, printing, and executing
 class Exp:
+    # A chain <fac> (+|-) <fac> ... is one node. Like the grammar, the chain
+    # groups right to left: a - b - c means a - (b - c)
+    __slots__ = ('facs', 'operators')
+
     def __init__(self):
-        self.altNo = 0   # <fac> or <fac> + <exp> or <fac> - <exp>
-        self.fac = None
-        self.operator = None
-        self.exp = None
+        self.facs = []        # <fac>, one or more
+        self.operators = ()   # '+' or '-' between consecutive facs
 
     # Parses expression node
-    def parseExp(self, tokenizer):
-        self.fac = Fac()
-        self.fac.parseFac(tokenizer)
-
-        t = tokenizer.getToken()
-        if t[0] == 22:   # case: <fac> + <exp>
-            self.altNo = 1
-            self.operator = '+'
-            tokenizer.skipToken()
-            self.exp = Exp()
-            self.exp.parseExp(tokenizer)
+    def parseExp(self, tokenizer, parser):
+        parser.nodes += 1
+        operators = []
+        while True:
+            fac = Fac()
+            fac.parseFac(tokenizer, parser)
+            self.facs.append(fac)
 
-        elif t[0] == 23:  # case: <fac> - <exp>
-            self.altNo = 2
-            self.operator = '-'
+            t = tokenizer.getToken()
+            if t[0] == 22:   # case: <fac> + <exp>
+                operators.append('+')
+            elif t[0] == 23:  # case: <fac> - <exp>
+                operators.append('-')
+            else:   # case: <fac>
+                break
             tokenizer.skipToken()
-            self.exp = Exp()
-            self.exp.parseExp(tokenizer)
+        if operators:
+            self.operators = tuple(operators)
 
     # Pretty prints expression
-    def printExp(self):
-        self.fac.printFac()
-        if self.altNo != 0:
-            print(self.operator, end=' ')
-            self.exp.printExp()
-
-    # Executes expression
-    def execExp(self):
-        res = self.fac.execFac()
-        # case: <fac> + <exp>
-        if self.altNo == 1:
-            res += self.exp.execExp()
-        # case: <fac> - <exp>
-        elif self.altNo == 2:
-            res -= self.exp.execExp()
+    def renderExp(self, out):
+        self.facs[0].renderFac(out)
+        for operator, fac in zip(self.operators, self.facs[1:]):
+            out.append(operator + ' ')
+            fac.renderFac(out)
+
+    # Returns, for each fac after the first, whether it is subtracted once
+    # the chain is flattened left to right: a - (b - c) == a - b + c
+    def negations(self):
+        flags = []
+        negative = False
+        for operator in self.operators:
+            if operator == '-':
+                negative = not negative
+            flags.append(negative)
+        return flags
+
+    # Executes expression. Each '-' flips the sign of every fac after it,
+    # which gives the right to left grouping while evaluating left to right
+    def execExp(self, rt):
+        facs = self.facs
+        res = facs[0].execFac(rt)
+        negative = False
+        for i in range(1, len(facs)):
+            if self.operators[i - 1] == '-':
+                negative = not negative
+            if negative:
+                res -= facs[i].execFac(rt)
+            else:
+                res += facs[i].execFac(rt)
         return res
 
 
 # Class for Fac. Allows for parsing, printing, and executing
 class Fac:
+    # A chain <op> * <op> ... is one node
+    __slots__ = ('ops',)
+
     def __init__(self):
-        self.altNo = 0   # <op> or <op> * < fac>
-        self.op = None
-        self.operator = None
-        self.fac = None
+        self.ops = []   # <op>, one or more, multiplied together
 
     # Parses factor node
-    def parseFac(self, tokenizer):
-        self.op = Op()
-        self.op.parseOp(tokenizer)
+    def parseFac(self, tokenizer, parser):
+        parser.nodes += 1
+        while True:
+            op = Op()
+            op.parseOp(tokenizer, parser)
+            self.ops.append(op)
 
-        t = tokenizer.getToken()
-        if t[0] == 24:  # case: <op> * <fac>
-            self.altNo = 1
-            self.operator = '*'
+            t = tokenizer.getToken()
+            if t[0] != 24:  # case: <op>, no more '*'
+                break
             tokenizer.skipToken()
-            self.fac = Fac()
-            self.fac.parseFac(tokenizer)
 
     # Pretty prints factor
-    def printFac(self):
-        self.op.printOp()
-        if self.altNo == 1:
-            print(self.operator, end=' ')
-            self.fac.printFac()
+    def renderFac(self, out):
+        self.ops[0].renderOp(out)
+        for op in self.ops[1:]:
+            out.append('* ')
+            op.renderOp(out)
 
     # Executes factor
-    def execFac(self):
-        res = self.op.execOp()
-        if self.altNo == 1:
-            res *= self.fac.execFac()
+    def execFac(self, rt):
+        ops = self.ops
+        res = ops[0].execOp(rt)
+        for i in range(1, len(ops)):
+            res *= ops[i].execOp(rt)
         return res
 
 
 # Class for Op. Allows for parsing, printing, and executing
+# value holds the int, the ID node or the Exp node
 class Op:
+    __slots__ = ('altNo', 'value', 'checked')
+
     def __init__(self):
         self.altNo = 0   # <int> or <id> or (<exp>)
-        self.int_obj = None
-        self.id = None
-        self.exp = None
+        self.value = None
+        self.checked = True   # cleared by the analysis once <id> is proven initialized
+
+    int_obj = alternative('value', 0)
+    id = alternative('value', 1)
+    exp = alternative('value', 2)
 
     # Parses operand node
-    def parseOp(self, tokenizer):
+    def parseOp(self, tokenizer, parser):
+        parser.nodes += 1
         t = tokenizer.getToken()
 
         if t[0] == 31:
             self.altNo = 0
-            self.int_obj = IntObj()
-            self.int_obj = self.int_obj.parseIntObj(tokenizer)
+            self.value = t[1]   # operands hold the int directly
+            tokenizer.skipToken()
         elif t[0] == 32:
             self.altNo = 1
-            self.id = ID()
-            self.id = self.id.parseID(tokenizer)
+            self.value = ID.parseID(tokenizer, parser)
         elif t[0] == 20:
             self.altNo = 2
             tokenizer.skipToken()
-            self.exp = Exp()
-            self.exp.parseExp(tokenizer)
+            self.value = Exp()
+            self.value.parseExp(tokenizer, parser)
             t = tokenizer.getToken()
             if t[0] != 21:   # should be ')'
-                print("Error: Token did not match ')'")
-                sys.exit()
+                raise CoreError("Token did not match ')'")
             tokenizer.skipToken()   # Added this
         else:
             return 'Error: Token did not match op'
 
     # Pretty print operand
-    def printOp(self):
+    def renderOp(self, out):
         if self.altNo == 0:
-            print(self.int_obj, end='')
+            out.append(str(self.value))
         elif self.altNo == 1:
-            print(self.id.getIDName(), end=' ')
+            out.append(self.value.getIDName() + ' ')
         elif self.altNo == 2:
-            print('(', end=' ')
-            self.exp.printExp()
-            print(')', end=' ')
+            out.append('( ')
+            self.value.renderExp(out)
+            out.append(') ')
 
     # Execute operand
-    def execOp(self):
+    def execOp(self, rt):
         if self.altNo == 0:
-            return self.int_obj
+            return self.value
         elif self.altNo == 1:
-            return self.id.getIdVal()
+            if self.checked:
+                return self.value.getIdVal(rt)
+            return self.value.getIdValUnchecked(rt)
         elif self.altNo == 2:
-            return self.exp.execExp()
+            return self.value.execExp(rt)
 
 
 # Class for CompOp. Allows for parsing, printing, and executing
+# There is one shared node per comparison operator, see COMP_OPS
 class CompOp:
-    def __init__(self):
-        self.comp_operator = None
+    __slots__ = ('comp_operator',)
+
+    def __init__(self, comp_operator=None):
+        self.comp_operator = comp_operator
 
     # Parses comparison operator
-    def parseCompOp(self, tokenizer):
+    # Returns the shared node for it
+    @staticmethod
+    def parseCompOp(tokenizer):
         t = tokenizer.getToken()
-
-        if t[0] == 25:
-            self.comp_operator = '!='
-        elif t[0] == 26:
-            self.comp_operator = '=='
-        elif t[0] == 27:
-            self.comp_operator = '<'
-        elif t[0] == 28:
-            self.comp_operator = '>'
-        elif t[0] == 29:
-            self.comp_operator = '<='
-        elif t[0] == 30:
-            self.comp_operator = '>='
-
+        comp_op = COMP_OPS.get(t[0], NO_COMP_OP)
         tokenizer.skipToken()
+        return comp_op
 
     # Pretty prints comparison operator
-    def printCompOp(self):
-        print(self.comp_operator, end=' ')
+    def renderCompOp(self, out):
+        out.append(str(self.comp_operator) + ' ')
 
     # Returns comparison operator represented by this node
     def getCompOp(self):
         return self.comp_operator
 
 
+# Shared comparison operator nodes, by token
+COMP_OPS = {25: CompOp('!='), 26: CompOp('=='), 27: CompOp('<'),
+            28: CompOp('>'), 29: CompOp('<='), 30: CompOp('>=')}
+# Node for a token that is not a comparison operator
+NO_COMP_OP = CompOp()
+
+
+# Returns the shared node for comp_operator, None for NO_COMP_OP
+def sharedCompOp(comp_operator):
+    for comp_op in COMP_OPS.values():
+        if comp_op.comp_operator == comp_operator:
+            return comp_op
+    return NO_COMP_OP
+
+
+# Class for Symbol Table. Maps identifier names to their ID nodes and hands
+# out dense slot numbers to identifiers as they are declared
+class SymbolTable:
+    __slots__ = ('ids', 'slots')
+
+    def __init__(self):
+        self.ids = {}     # name -> ID, every identifier seen
+        self.slots = []   # slot -> ID, declared identifiers first
+
+    # Returns the ID node for name, adding it on first occurrence
+    def lookup(self, name):
+        ident = self.ids.get(name)
+        if ident is None:
+            ident = ID()
+            ident.name = name
+            self.ids[name] = ident
+        return ident
+
+    # Gives ident the next free slot unless it already has one
+    # Returns the slot of ident
+    def declare(self, ident):
+        if ident.slot is None:
+            ident.slot = len(self.slots)
+            self.slots.append(ident)
+        return ident.slot
+
+    # Gives a slot to every identifier used without being declared, after
+    # the declared ones. Those slots never receive a value
+    def declareRemaining(self):
+        for ident in self.ids.values():
+            self.declare(ident)
+
+    # Returns the ID node held in slot
+    def getSlot(self, slot):
+        return self.slots[slot]
+
+    # Number of slots handed out
+    def __len__(self):
+        return len(self.slots)
+
+    # Checks if an identifier called name has been seen
+    def __contains__(self, name):
+        return name in self.ids
+
+
 # Class for ID. Allows for parsing, printing, and executing
+# Values live in the frame of the Runtime of each run, at the slot of the ID
+# node, so a parsed program can be run many times
 class ID:
-    # Variables available to all instances of ID
-    id_list = []   # contains all existing IDs
+    __slots__ = ('name', 'slot')
 
     def __init__(self):
         self.name = None
-        self.val = None
-        self.declared = False
-        self.initialized = False
+        self.slot = None   # index in the frame, assigned by the symbol table
 
-    # Parses identifiers, only adds them to id_list if they have not been initialized
+    # Parses identifiers, only adds them to the symbol table if they have not been seen
     @staticmethod
-    def parseID(tokenizer):
+    def parseID(tokenizer, parser):
         t = tokenizer.getToken()
 
         if t[0] != 32:    # should be an identifier
-            print("Error: Token is not an identifier")
-            sys.exit()
-
-        # Check if ID we're parsing is in the ID List
-        for ident in ID.id_list:
-            # Return it if it is
-            if ident.name == t[1]:
-                tokenizer.skipToken()
-                return ident
-        # If not, add it to the list
-        new_id = ID()
-        new_id.name = t[1]
+            raise CoreError("Token is not an identifier")
 
-        ID.id_list.append(new_id)
+        if t[1] not in parser.symbols:   # the first occurrence builds the node
+            parser.nodes += 1
+        ident = parser.symbols.lookup(t[1])
         tokenizer.skipToken()
-
-        return new_id
+        return ident
 
     # Returns value held by this identifier
-    def getIdVal(self):
-        if not self.initialized:
-            print('Error: Identifier not initialized')
-            sys.exit()
-        return int(self.val)
+    def getIdVal(self, rt):
+        value = rt.frame[self.slot]
+        if value is None:
+            rt.fail('Identifier not initialized')
+        return value
+
+    # Returns value held by this identifier, which must be initialized
+    def getIdValUnchecked(self, rt):
+        return rt.frame[self.slot]
 
     # Sets an ID value for this identifier
-    def setIdVal(self, value):
-        self.val = value
+    def setIdVal(self, rt, value):
+        rt.frame[self.slot] = value
 
     # Gets identifier name for this identifier
     def getIDName(self):
         return self.name
 
     # Checks if identifier has been declared
-    def isDeclared(self):
-        return self.declared
+    def isDeclared(self, rt):
+        return self in rt.declared
 
     # Marks identifier as declared
-    def setDeclared(self):
-        self.declared = True
-
-    # Checks if identifier has been initialized
-    def isInitialized(self):
-        return self.initialized
-
-    # Marks identifier as initialized
-    def setInitialized(self):
-        self.initialized = True
-
-
-# Class for Int. Allows for parsing, printing, and executing
-class IntObj:
-    def __init__(self):
-        self.num = None
-
-    # Parses int
-    def parseIntObj(self, tokenizer):
-        t = tokenizer.getToken()
-        if t[0] != 31:   # Should be a valid integer
-            print('Error: Token is not a valid int')
-            sys.exit()
-
-        self.num = t[1]
-        tokenizer.skipToken()
-        return self.num
-
-    # Pretty prints int
-    def printIntObj(self):
-        return self.num
+    def setDeclared(self, rt):
+        rt.declared.add(self)
 
-    # Returns value of int as int
-    def getVal(self):
-        return int(self.num)
+    # Checks if identifier holds a value
+    def isInitialized(self, rt):
+        return rt.frame[self.slot] is not None
 
 
-# Adds appropriate number of tabs according to n
+# Returns appropriate number of tabs according to n
 def indentation(n):
-    print('\t' * n, end='')
+    return '\t' * n
 
 
 
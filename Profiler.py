@@ -0,0 +1,132 @@
+# Profiler for Core Interpreter
+# Runs a program on the closures of ClosureCompiler, with every statement
+# wrapped to count its executions and time them, and every loop counting its
+# iterations. Statements are identified by the source line they start on.
+# Only programs run through Interpreter.profile pay for this, the engines
+# themselves are never instrumented
+# Author: Wilmer Pellicier
+import json
+import time
+
+import ClosureCompiler
+
+# Names of the statement alternatives, by altNo
+KINDS = ('assign', 'if', 'while', 'read', 'write')
+
+
+# Class for Statement Profile. What was recorded for one statement. time
+# includes the statements nested in it
+class StmtProfile:
+    __slots__ = ('line', 'kind', 'count', 'time', 'iterations')
+
+    def __init__(self, line, kind):
+        self.line = line
+        self.kind = kind
+        self.count = 0        # times executed
+        self.time = 0.0       # seconds spent executing it
+        self.iterations = 0   # times the body ran, for loops
+
+    # Returns the fields by name
+    def toDict(self):
+        fields = {'line': self.line, 'kind': self.kind, 'count': self.count, 'time': self.time}
+        if self.kind == 'while':
+            fields['iterations'] = self.iterations
+        return fields
+
+
+# Class for Profile. The statement profiles of one run, a nested statement
+# before the statement holding it
+class Profile:
+    def __init__(self):
+        self.stmts = []
+        self.time = 0.0   # seconds the whole run took
+
+    # Returns a new statement profile for stmt
+    def add(self, stmt):
+        entry = StmtProfile(stmt.line, KINDS[stmt.altNo])
+        self.stmts.append(entry)
+        return entry
+
+    # Returns the statement profiles that ran, hottest first
+    def hotSpots(self):
+        ran = [entry for entry in self.stmts if entry.count]
+        return sorted(ran, key=lambda entry: (-entry.time, entry.line))
+
+    # Returns a readable report of the limit hottest statements, all when None
+    def format(self, limit=None):
+        lines = ['Profile: %.6fs' % self.time,
+                 '%6s  %-6s %10s %12s %12s %7s' % ('line', 'kind', 'count', 'iterations',
+                                                   'time', '%')]
+        for entry in self.hotSpots()[:limit]:
+            iterations = entry.iterations if entry.kind == 'while' else ''
+            share = 100 * entry.time / self.time if self.time else 0.0
+            lines.append('%6d  %-6s %10d %12s %11.6fs %6.1f%%' % (
+                entry.line, entry.kind, entry.count, iterations, entry.time, share))
+        return '\n'.join(lines)
+
+    # Returns the profile as JSON, statements hottest first
+    def toJson(self):
+        return json.dumps({'time': self.time,
+                           'statements': [entry.toDict() for entry in self.hotSpots()]},
+                          indent=2)
+
+
+# Compiles program node into a callable taking the runtime state, recording
+# into profile as it runs
+def compileProgram(prog, profile, short_circuit=False):
+    program = ClosureCompiler.compileProgram(prog, short_circuit, StmtWrapper(profile).wrap)
+    clock = time.perf_counter
+
+    def run(rt):
+        start = clock()
+        try:
+            program(rt)
+        finally:
+            profile.time += clock() - start
+    return run
+
+
+# Class for Statement Wrapper. Wraps the closures of statements to record
+# them into profile. A loop takes its iterations from those counted in the
+# runtime state while it runs, less those of the loops nested in it
+class StmtWrapper:
+    def __init__(self, profile):
+        self.profile = profile
+        self.nested = [0]   # iterations of nested loops, per loop running
+
+    # Returns the closure of stmt wrapped to time each execution. Statements
+    # stopped by an error are still counted
+    def wrap(self, stmt, body):
+        entry = self.profile.add(stmt)
+        clock = time.perf_counter
+        if stmt.altNo == 2:   # Case <loop>
+            return self.wrapLoop(entry, body)
+
+        def run(rt):
+            start = clock()
+            try:
+                body(rt)
+            finally:
+                entry.count += 1
+                entry.time += clock() - start
+        return run
+
+    # Returns the closure of a loop wrapped to time each execution and count
+    # its iterations in entry
+    def wrapLoop(self, entry, body):
+        clock = time.perf_counter
+        nested = self.nested
+
+        def run(rt):
+            start = clock()
+            iterations = rt.iterations
+            nested.append(0)
+            try:
+                body(rt)
+            finally:
+                ran = rt.iterations - iterations
+                entry.iterations += ran - nested.pop()
+                nested[-1] += ran
+                entry.count += 1
+                entry.time += clock() - start
+        return run
@@ -0,0 +1,111 @@
+# Runtime class for Core Interpreter
+# Holds the state of one execution of a parsed program
+# Author: Wilmer Pellicier
+import sys
+import time
+
+from Output import BufferedOutput
+from Input import PromptInput, SequenceInput
+from Errors import CoreError, LimitError
+
+
+
+# Class for Limits. The most a run may do before it is stopped with a
+# LimitError, None for no limit. Limits are checked as loop iterations start,
+# code outside loops cannot run for long
+class Limits:
+    def __init__(self, statements=None, iterations=None, seconds=None):
+        self.statements = statements   # statements executed
+        self.iterations = iterations   # loop iterations
+        self.seconds = seconds         # wall clock time
+
+    # Returns the limits every run stops at the same point with, for the
+    # result cache key
+    def bounds(self):
+        return self.statements, self.iterations
+
+
+class Runtime:
+    # Parameter inputs is the input provider of read statements, see Input.py,
+    # or a sequence of the values to hand them in order. When omitted values
+    # are prompted for on standard input
+    # Parameter short_circuit makes the tree walker stop evaluating && and ||
+    # once the result is known
+    # Parameter output is the sink taking the lines of write statements,
+    # buffered standard output when omitted
+    # Parameter limits is the Limits the run is stopped at, none when omitted
+    def __init__(self, inputs=None, short_circuit=False, output=None, limits=None):
+        self.frame = []           # slot -> int value, None until initialized
+        self.declared = set()     # IDs declared so far
+        self.short_circuit = short_circuit
+        self.error = None         # CoreError that stopped the run, if any
+        # Counters every engine keeps. Statements are counted as the sequence
+        # holding them starts, iterations as a loop body starts
+        self.steps = 0            # statements executed
+        self.iterations = 0       # loop iterations
+        self.reads = 0            # values read
+        self.limits = Limits() if limits is None else limits
+        self.start = time.perf_counter()
+        self.deadline = None if self.limits.seconds is None else self.start + self.limits.seconds
+        # Engines call checkLimits as a loop iteration starts once the
+        # iterations reach check_at or the statements go over max_steps
+        self.max_steps = sys.maxsize if self.limits.statements is None else self.limits.statements
+        self.check_at = self.nextCheck(0)
+        self.output = BufferedOutput() if output is None else output
+        if inputs is None:
+            self.input = PromptInput(self.output)
+        elif hasattr(inputs, 'readInt'):
+            self.input = inputs
+        else:
+            self.input = SequenceInput(inputs)
+
+    # Makes room for the values of a program with size slots, all of them
+    # uninitialized
+    def allocate(self, size):
+        self.frame = [None] * size
+
+    # Stops the program with a runtime error, reported after the output
+    # written so far by Interpreter.run
+    def fail(self, message):
+        raise CoreError(message)
+
+    # Returns the next input value, as an int, for the identifier called name
+    def readValue(self, name):
+        try:
+            value = self.input.readInt(name)
+        except ValueError:   # the value given is not an integer
+            self.fail('Invalid input for ' + name)
+        if value is None:
+            self.fail('No input left for ' + name)
+        self.reads += 1
+        return value
+
+    # Checks the limits as an iteration of the loop on line starts, given the
+    # statements and iterations so far. Raises LimitError when one is exceeded
+    # Returns the iterations at which to check again, also kept in check_at
+    def checkLimits(self, line, steps, iterations):
+        limits = self.limits
+        if steps > self.max_steps:
+            self.exceeded('statements', limits.statements, line, steps, iterations)
+        if limits.iterations is not None and iterations > limits.iterations:
+            self.exceeded('iterations', limits.iterations, line, steps, iterations)
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self.exceeded('seconds', limits.seconds, line, steps, iterations)
+        self.check_at = self.nextCheck(iterations)
+        return self.check_at
+
+    # Returns the iterations at which checkLimits is next needed, after
+    # iterations so far
+    def nextCheck(self, iterations):
+        check_at = sys.maxsize
+        if self.deadline is not None:
+            # Iterations can each take longer than the last, so no count of
+            # them bounds the time between two looks at the clock
+            check_at = iterations + 1
+        if self.limits.iterations is not None:
+            check_at = min(check_at, self.limits.iterations + 1)
+        return check_at
+
+    # Stops the program for going over limit
+    def exceeded(self, limit, bound, line, steps, iterations):
+        raise LimitError(limit, bound, line, steps, iterations, time.perf_counter() - self.start)
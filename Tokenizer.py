@@ -2,39 +2,127 @@
 # Author: Wilmer Pellicier
 
 import sys
+import io
 import re
+import mmap
+import bisect
+import time
+from array import array
+
+# Legal tokens from 1 to 33
+RESERVED = {'program': 1, 'begin': 2, 'end': 3,
+            'int': 4, 'if': 5, 'then': 6, 'else': 7,
+            'while': 8, 'loop': 9, 'read': 10, 'write': 11}
+
+SPECIAL = {';': 12, ',': 13, '=': 14, '!': 15, '[': 16, ']': 17,
+           '&&': 18, '||': 19, '(': 20, ')': 21, '+': 22, '-': 23,
+           '*': 24, '!=': 25, '==': 26, '<': 27, '>': 28,
+           '<=': 29, '>=': 30}
+INTEGER = 31
+IDENTIFIER = 32
+EOF = 33
+INVALID = -1
+
+WHITESPACE = ' \t\n\r'
+
+# Characters read at a time by the streaming lexer
+CHUNK_SIZE = 64 * 1024
+
+
+# Builds the master pattern for the regex lexer. Each alternative mirrors one
+# outcome of Tokenizer.nextWordOrSeparator, so both lexers agree token for token:
+#   - operators: two-character operators win over their one-character prefixes
+#   - reserved words and integers: the whole word, however it is terminated
+#   - id: a word ended by whitespace must be a well-formed identifier
+#   - cut: a word cut short by a special character is never validated
+#   - bad: anything else is invalid
+def buildTokenPattern():
+    singles = ''.join(c for c in SPECIAL if len(c) == 1)
+    delims = re.escape(WHITESPACE + singles)
+    word_end = r'(?![^%s])' % delims
+    ws_end = r'(?=[%s]|\Z)' % re.escape(WHITESPACE)
+
+    operators = sorted(SPECIAL, key=len, reverse=True)
+    words = sorted(RESERVED, key=len, reverse=True)
+    return '|'.join([
+        r'(?P<op>%s)' % '|'.join(re.escape(op) for op in operators),
+        r'(?P<reserved>(?:%s)%s)' % ('|'.join(words), word_end),
+        r'(?P<int>\d+%s)' % word_end,
+        r'(?P<id>(?=[A-Z\d]{1,7}%s)[A-Z]+\d*%s)' % (ws_end, ws_end),
+        r'(?P<cut>[^%s]+(?=[%s]))' % (delims, re.escape(singles)),
+        r'(?P<bad>[^%s]+)' % delims,
+    ])
+
+
+# Whitespace matches no alternative, so finditer skips over it
+TOKEN_PATTERN = re.compile(buildTokenPattern())
+BYTES_TOKEN_PATTERN = re.compile(buildTokenPattern().encode())
+NEWLINE_PATTERN = re.compile(b'\n')
+
+# Tokens a statement can follow: 'begin', 'then', 'else', 'loop' and ';'
+STMT_BOUNDARIES = frozenset((2, 6, 7, 9, 12))
+
+# Shared token for every kind that carries no value
+PLAIN_TOKENS = {kind: (kind,) for kind in
+                list(RESERVED.values()) + list(SPECIAL.values()) + [EOF, INVALID]}
+
+
+# Tokenizes text with the master pattern, yielding tokens in the same
+# list form Tokenizer.consumeLine produces
+def scanTokens(text):
+    for m in TOKEN_PATTERN.finditer(text):
+        group = m.lastgroup
+        if group == 'op':
+            yield [SPECIAL[m.group()]]
+        elif group == 'id' or group == 'cut':
+            yield [IDENTIFIER, m.group()]
+        elif group == 'reserved':
+            yield [RESERVED[m.group()]]
+        elif group == 'int':
+            yield [INTEGER, int(m.group())]
+        elif m.end() - m.start() == 1:
+            # The scanner encodes a one-character invalid token as '-'
+            yield [SPECIAL['-']]
+        else:
+            yield [INVALID]
 
 
 class Tokenizer:
     # constructor for tokenizer
     def __init__(self, filename):
         # Legal tokens from 1 to 33
-        self.reserved = {'program': 1, 'begin': 2, 'end': 3,
-                         'int': 4, 'if': 5, 'then': 6, 'else': 7,
-                         'while': 8, 'loop': 9, 'read': 10, 'write': 11}
-
-        self.special = {';': 12, ',': 13, '=': 14, '!': 15, '[': 16, ']': 17,
-                        '&&': 18, '||': 19, '(': 20, ')': 21, '+': 22, '-': 23,
-                        '*': 24, '!=': 25, '==': 26, '<': 27, '>': 28,
-                        '<=': 29, '>=': 30}
-        self.integer = 31
-        self. identifier = 32
-        self.eof = 33
-
-        self.whitespace = ' \t\n\r'
+        self.reserved = RESERVED
+        self.special = SPECIAL
+        self.integer = INTEGER
+        self.identifier = IDENTIFIER
+        self.eof = EOF
+
+        self.whitespace = WHITESPACE
         self.current_tokens = []
+        self.line_no = 0   # line the current tokens come from
+        self.produced = 0  # tokens produced so far
+        self.time = 0.0    # seconds spent producing them
 
         # Opening file for reading
         self.f = open(filename)
-        self.consumeLine()
+        self.fillTokens()
 
         self.curr = 0
 
+    # Produces the next current tokens, counting them and the time taken
+    def fillTokens(self):
+        start = time.perf_counter()
+        self.consumeLine()
+        self.produced += len(self.current_tokens)
+        self.time += time.perf_counter() - start
+
     # Takes a line from file and tokenizes it
     def consumeLine(self):
         line = self.f.readline()  # Get next line from file
+        self.line_no += 1
         while line == '\n' or line == '\t' or line == '\r' or line == ' ':
             line = self.f.readline()
+            self.line_no += 1
 
         pos = 0
         while pos < len(line):
@@ -124,13 +212,17 @@ class Tokenizer:
     def getToken(self):
         return self.current_tokens[self.curr]
 
+    # Returns the source line of the current token, counting from 1
+    def lineNo(self):
+        return self.line_no
+
     # Skips current token, next token will be current
     def skipToken(self):
         if self.curr < len(self.current_tokens) - 1:
             self.curr += 1
         else:
             self.current_tokens = []
-            self.consumeLine()
+            self.fillTokens()
             self.curr = 0
         if self.getToken()[0] == 33:
             self.f.close()
@@ -151,6 +243,206 @@ class Tokenizer:
         else:
             return "Error: current token is not an identifier."
 
+
+# Regex lexer mode. Produces the same tokens as Tokenizer, but matches each
+# line against the precompiled master pattern instead of growing tokens one
+# character at a time
+class RegexTokenizer(Tokenizer):
+    # Takes lines from file until one of them holds tokens
+    def consumeLine(self):
+        while not self.current_tokens:
+            line = '' if self.f.closed else self.f.readline()
+            self.line_no += 1
+            # Reached EOF, repeated calls keep returning EOF
+            if line == '':
+                self.current_tokens.append([EOF])
+                self.f.close()
+            else:
+                self.current_tokens.extend(scanTokens(line))
+
+    # Skips current token, next token will be current
+    def skipToken(self):
+        self.curr += 1
+        if self.curr == len(self.current_tokens):
+            self.current_tokens = []
+            self.curr = 0
+            self.fillTokens()
+
+
+# Bulk lexer. Maps the whole file once and stores the token stream compactly:
+# an array of kinds, a parallel array of indexes into a table of interned
+# identifier names and integer literals (-1 for tokens without a value)
+class BulkTokenizer:
+    # constructor for tokenizer
+    def __init__(self, filename):
+        self.kinds = array('h')
+        self.values = array('i')
+        self.marks = array('q')      # index of each token a statement can start at
+        self.offsets = array('q')    # offset of each of those tokens in the file
+        self.newlines = array('q')   # offset of each newline in the file
+        self.table = []
+
+        start = time.perf_counter()
+        with open(filename, 'rb') as f:
+            try:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:   # empty files cannot be mapped
+                buf = b''
+            self.consumeBuffer(buf)
+            if buf:
+                buf.close()
+        self.produced = len(self.kinds)            # tokens produced
+        self.time = time.perf_counter() - start   # seconds spent producing them
+
+        self.curr = 0
+
+    # Tokenizes the whole buffer into the token arrays
+    def consumeBuffer(self, buf):
+        codes = {word.encode(): code for word, code in RESERVED.items()}
+        codes.update((op.encode(), code) for op, code in SPECIAL.items())
+        interned = {}
+        kinds = self.kinds
+        values = self.values
+        marks = self.marks
+        offsets = self.offsets
+        table = self.table
+        self.newlines.extend(m.start() for m in NEWLINE_PATTERN.finditer(buf))
+
+        mark = True   # whether a statement can start at the next token
+        for m in BYTES_TOKEN_PATTERN.finditer(buf):
+            if mark:
+                marks.append(len(kinds))
+                offsets.append(m.start())
+            group = m.lastgroup
+            text = m.group()
+            if group == 'op' or group == 'reserved':
+                code = codes[text]
+                kinds.append(code)
+                values.append(-1)
+                mark = code in STMT_BOUNDARIES
+                continue
+
+            mark = False
+            if group == 'id' or group == 'cut':
+                kinds.append(IDENTIFIER)
+            elif group == 'int':
+                kinds.append(INTEGER)
+            else:
+                # The scanner encodes a one-character invalid token as '-'
+                kinds.append(SPECIAL['-'] if len(text) == 1 else INVALID)
+                values.append(-1)
+                continue
+
+            index = interned.get(text)
+            if index is None:
+                index = interned[text] = len(table)
+                table.append(int(text) if group == 'int' else text.decode())
+            values.append(index)
+
+        # Reached EOF
+        kinds.append(EOF)
+        values.append(-1)
+        if mark:
+            marks.append(len(kinds) - 1)
+            offsets.append(len(buf))
+
+    # Returns info about current token
+    # Repeated calls return token
+    def getToken(self):
+        kind = self.kinds[self.curr]
+        if kind == INTEGER or kind == IDENTIFIER:
+            return kind, self.table[self.values[self.curr]]
+        return PLAIN_TOKENS[kind]
+
+    # Returns the source line of the current token, counting from 1. Only
+    # tokens a statement can start at are exact, any other token gets the
+    # line of the last of those before it
+    def lineNo(self):
+        mark = bisect.bisect_right(self.marks, self.curr) - 1
+        return bisect.bisect_right(self.newlines, self.offsets[mark]) + 1
+
+    # Skips current token, next token will be current
+    def skipToken(self):
+        if self.curr < len(self.kinds) - 1:
+            self.curr += 1
+
+    # Returns value of integer token
+    # Returns error if current is not integer
+    def intVal(self):
+        if self.kinds[self.curr] == INTEGER:
+            return self.table[self.values[self.curr]]
+        else:
+            return "Error: current token is not an integer."
+
+    # Returns the name (string) of current identifier token
+    # Returns error if current is not identifier
+    def idName(self):
+        if self.kinds[self.curr] == IDENTIFIER:
+            return self.table[self.values[self.curr]]
+        else:
+            return "Error: current token is not an identifier."
+
+
+# Streaming lexer. Pulls the source from any text stream (or a string holding
+# the program) in bounded chunks. Only text up to the last whitespace of a
+# chunk is tokenized, the tail is carried over to the next chunk so tokens
+# crossing a chunk boundary are never split
+class StreamTokenizer(RegexTokenizer):
+    # constructor for tokenizer
+    def __init__(self, source, chunk_size=CHUNK_SIZE):
+        self.current_tokens = []
+        self.current_lines = []   # source line of each current token
+        self.line_no = 1          # line the pending text starts on
+        self.pending = ''   # tail of the last chunk, not yet tokenized
+        self.chunk_size = chunk_size
+        self.produced = 0   # tokens produced so far
+        self.time = 0.0     # seconds spent producing them
+
+        if isinstance(source, str):
+            source = io.StringIO(source)
+        self.f = source
+        self.fillTokens()
+
+        self.curr = 0
+
+    # Takes chunks from the stream until they hold tokens
+    def consumeLine(self):
+        self.current_lines = []
+        while not self.current_tokens:
+            chunk = self.f.read(self.chunk_size)
+            # Reached EOF, repeated calls keep returning EOF
+            if chunk == '':
+                self.scanLines(self.pending)
+                self.pending = ''
+                self.current_tokens.append([EOF])
+                self.current_lines.append(self.line_no)
+                return
+
+            text = self.pending + chunk
+            cut = max(text.rfind(c) for c in WHITESPACE) + 1
+            self.scanLines(text[:cut])
+            self.pending = text[cut:]
+
+    # Tokenizes text line by line, noting the line of each token. Tokens
+    # never span a newline, so this gives the same tokens as the whole text
+    def scanLines(self, text):
+        tokens = self.current_tokens
+        lines = self.current_lines
+        pieces = text.split('\n')
+        for line_no, piece in enumerate(pieces, self.line_no):
+            count = len(tokens)
+            tokens.extend(scanTokens(piece))
+            lines.extend([line_no] * (len(tokens) - count))
+        self.line_no += len(pieces) - 1
+
+    # Returns the source line of the current token, counting from 1
+    def lineNo(self):
+        return self.current_lines[self.curr]
+
+
+# Available lexers, by the name used on the command line
+LEXERS = {'scanner': Tokenizer, 'regex': RegexTokenizer, 'bulk': BulkTokenizer}
+
 '''
 def main():
     # Main for isolated tokenizer testing
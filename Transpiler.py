@@ -0,0 +1,252 @@
+# Core to Python transpiler for Core Interpreter
+# Translates a parse tree into the source of one Python function: Core
+# variables become its locals, while and if map to Python statements and
+# conditions become native boolean expressions, so CPython's own bytecode
+# runs the loops. Code objects can be cached on disk with marshal, keyed by
+# a hash of the Core source, so repeat runs skip tokenizing, parsing and
+# code generation
+# Author: Wilmer Pellicier
+import os
+import types
+import marshal
+import hashlib
+import importlib.util
+
+import Cache
+import ClosureCompiler
+from Version import VERSION
+
+# Cache directory, created next to the Core file like __pycache__
+CACHE_DIR = '__corecache__'
+
+
+# Compiles program node into a callable taking the runtime state
+# Parameter short_circuit makes && and || stop evaluating once the result
+# is known
+def compileProgram(prog, short_circuit=False):
+    code = compileCode(prog, short_circuit)
+    # Programs nested deeper than CPython accepts run on closures instead
+    if code is None:
+        return ClosureCompiler.compileProgram(prog, short_circuit)
+    return loadCode(code)
+
+
+# Returns the code object for program node, or None if CPython cannot
+# compile the generated source
+def compileCode(prog, short_circuit=False):
+    try:
+        return compile(generateSource(prog, short_circuit), '<core>', 'exec')
+    except (SyntaxError, RecursionError, MemoryError):
+        return None
+
+
+# Returns the generated function held by code
+def loadCode(code):
+    namespace = {}
+    exec(code, namespace)
+    return namespace['core_main']
+
+
+# Returns the Python source for program node
+def generateSource(prog, short_circuit=False):
+    generator = Generator(short_circuit)
+    generator.genProgram(prog)
+    return '\n'.join(generator.lines) + '\n'
+
+
+# Class for Generator. Emits the Python source for each node
+class Generator:
+    def __init__(self, short_circuit=False):
+        self.lines = []
+        self.names = {}       # ID -> Python local name
+        self.declared = set()
+        self.short_circuit = short_circuit
+
+    # Adds a line at indentation level i
+    def emit(self, i, line):
+        self.lines.append('    ' * i + line)
+
+    # Returns the Python local holding identifier ident
+    def name(self, ident):
+        if ident not in self.names:
+            if ident.name.isidentifier():
+                self.names[ident] = 'v_' + ident.name
+            else:
+                self.names[ident] = 'v%d_' % len(self.names)
+        return self.names[ident]
+
+    # Generates program node. Declarations are known statically, only a
+    # repeated declaration leaves code behind
+    def genProgram(self, prog):
+        self.emit(0, 'def core_main(rt):')
+        self.emit(1, '_read = rt.readValue')
+        self.emit(1, '_write = rt.output.write')
+        self.emit(1, '_fail = rt.fail')
+
+        for decl in prog.decl_seq.decls:
+            for ident in decl.idList.ids:
+                if ident in self.declared:
+                    self.emit(1, '_fail(%r)' % (ident.name + ' already declared'))
+                    return
+                self.declared.add(ident)
+
+        # Reading a local before any assignment raises NameError. The counters
+        # and limits are locals too, the counters are handed back to the
+        # runtime state however the run ends
+        self.emit(1, '_steps = rt.steps')
+        self.emit(1, '_iterations = rt.iterations')
+        self.emit(1, '_check_at = rt.check_at')
+        self.emit(1, '_max_steps = rt.max_steps')
+        self.emit(1, 'try:')
+        self.genStmtSeq(prog.stmt_seq, 2)
+        self.emit(1, 'except NameError:')
+        self.emit(2, "_fail('Identifier not initialized')")
+        self.emit(1, 'finally:')
+        self.emit(2, 'rt.steps = _steps')
+        self.emit(2, 'rt.iterations = _iterations')
+
+    # Generates statement sequence at indentation level i
+    def genStmtSeq(self, stmt_seq, i):
+        if not stmt_seq.stmts:   # emptied by the optimizer
+            self.emit(i, 'pass')
+            return
+        self.emit(i, '_steps += %d' % len(stmt_seq.stmts))
+        for stmt in stmt_seq.stmts:
+            self.genStmt(stmt, i)
+
+    # Generates statement at indentation level i
+    def genStmt(self, stmt, i):
+        if stmt.altNo == 0:   # Case <assign>
+            self.genAssign(stmt.assign, i)
+        elif stmt.altNo == 1:   # Case <if>
+            self.genIf(stmt.if_stmt, i)
+        elif stmt.altNo == 2:   # Case <loop>
+            self.genLoop(stmt.loop, stmt.line, i)
+        elif stmt.altNo == 3:   # Case <in>
+            self.genInStmt(stmt.in_stmt, i)
+        else:   # Case <out>
+            self.genOutStmt(stmt.out_stmt, i)
+
+    # Generates assignment, assignments to undeclared identifiers do nothing
+    def genAssign(self, assign, i):
+        if assign.id in self.declared:
+            self.emit(i, '%s = %s' % (self.name(assign.id), self.genExp(assign.exp)))
+        else:
+            self.emit(i, 'pass')
+
+    # Generates if statement
+    def genIf(self, if_stmt, i):
+        self.emit(i, 'if %s:' % self.genCond(if_stmt.c))
+        self.genStmtSeq(if_stmt.stmtSeq1, i + 1)
+        if if_stmt.altNo == 1:
+            self.emit(i, 'else:')
+            self.genStmtSeq(if_stmt.stmtSeq2, i + 1)
+
+    # Generates loop on source line, checking the limits of the run as each
+    # iteration starts
+    def genLoop(self, loop, line, i):
+        self.emit(i, 'while %s:' % self.genCond(loop.c))
+        self.emit(i + 1, '_iterations += 1')
+        self.emit(i + 1, 'if _iterations >= _check_at or _steps > _max_steps:')
+        self.emit(i + 2, '_check_at = rt.checkLimits(%d, _steps, _iterations)' % line)
+        self.genStmtSeq(loop.stmt_seq, i + 1)
+
+    # Generates read statement, the input provider hands out ints
+    def genInStmt(self, in_stmt, i):
+        for ident in in_stmt.idList.ids:
+            if ident not in self.declared:
+                self.emit(i, '_fail(%r)' % (ident.name + ' not declared'))
+                return
+            self.emit(i, '%s = _read(%r)' % (self.name(ident), ident.name))
+
+    # Generates write statement
+    def genOutStmt(self, out_stmt, i):
+        for ident in out_stmt.idList.ids:
+            if ident not in self.declared:
+                self.emit(i, '_fail(%r)' % (ident.name + ' not declared'))
+                return
+            if ident in out_stmt.proven:
+                self.emit(i, '_write(%r + str(%s))' % (ident.name + ' = ', self.name(ident)))
+                continue
+            self.emit(i, 'try:')
+            self.emit(i + 1, '_val = ' + self.name(ident))
+            self.emit(i, 'except NameError:')
+            self.emit(i + 1, '_fail(%r)' % (ident.name + ' not initialized'))
+            self.emit(i, '_write(%r + str(_val))' % (ident.name + ' = '))
+
+    # Returns condition as a Python expression. & and | keep the eager
+    # evaluation of Cond.execCond, both operands are bools, and in short
+    # circuit mode Python's and / or are used instead
+    def genCond(self, cond):
+        if cond.altNo == 0:
+            return self.genComp(cond.comp)
+        elif cond.altNo == 1:
+            return '(not %s)' % self.genCond(cond.not_cond)
+        if self.short_circuit:
+            operator = 'and' if cond.altNo == 2 else 'or'
+        else:
+            operator = '&' if cond.altNo == 2 else '|'
+        return '(%s %s %s)' % (self.genCond(cond.left_cond), operator,
+                               self.genCond(cond.right_cond))
+
+    # Returns comparison as a Python expression. A token that is not a
+    # comparison operator still evaluates both operands, and is never true
+    def genComp(self, comp):
+        if comp.comp_op.getCompOp() is None:
+            return '((%s, %s) == ())' % (self.genOp(comp.op1), self.genOp(comp.op2))
+        return '(%s %s %s)' % (self.genOp(comp.op1), comp.comp_op.getCompOp(),
+                               self.genOp(comp.op2))
+
+    # Returns expression as a Python expression. Exp groups right to left,
+    # a - (b - c) is emitted as a - b + c so the source stays flat
+    def genExp(self, exp):
+        parts = [self.genFac(exp.facs[0])]
+        for fac, negative in zip(exp.facs[1:], exp.negations()):
+            parts.append(('- ' if negative else '+ ') + self.genFac(fac))
+        return ' '.join(parts)
+
+    # Returns factor as a Python expression
+    def genFac(self, fac):
+        return ' * '.join(self.genOp(op) for op in fac.ops)
+
+    # Returns operand as a Python expression
+    def genOp(self, op):
+        if op.altNo == 0:
+            return repr(op.int_obj)
+        elif op.altNo == 1:
+            return self.name(op.id)
+        else:
+            return '(%s)' % self.genExp(op.exp)
+
+
+# Returns the cache file for a Core file holding source (bytes). The key
+# covers the interpreter version, the bytecode format of this Python and
+# the options the program was compiled with, such as 'optimize'
+def cachePath(filename, source, options=()):
+    digest = hashlib.sha256()
+    digest.update(VERSION.encode())
+    digest.update(importlib.util.MAGIC_NUMBER)
+    digest.update(repr(sorted(options)).encode())
+    digest.update(source)
+    directory = os.path.join(os.path.dirname(os.path.abspath(filename)), CACHE_DIR)
+    return os.path.join(directory, digest.hexdigest() + '.marshal')
+
+
+# Returns the (listing, code) pair cached in path, or None if there is no
+# usable entry
+def loadCached(path):
+    try:
+        with open(path, 'rb') as f:
+            entry = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if (not isinstance(entry, tuple) or len(entry) != 2 or not isinstance(entry[0], str)
+            or not isinstance(entry[1], types.CodeType)):
+        return None
+    return entry
+
+
+# Caches the pretty printed listing and code object in path, see
+# Cache.writeAtomic. A read-only directory just means no cache
+def storeCached(path, listing, code):
+    Cache.writeAtomic(path, (marshal.dumps((listing, code)),))
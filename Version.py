@@ -0,0 +1,3 @@
+# Version of the Core Interpreter
+# Bump it whenever parsing or execution changes, on-disk caches are keyed on it
+VERSION = '1.4'
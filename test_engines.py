@@ -0,0 +1,225 @@
+# Engine tests for Core Interpreter
+# Runs fixture and generated programs on every engine in Interpreter.ENGINES,
+# with and without the optimizer and short circuit mode, and checks each one
+# against the tree walking engine: same output, same error and same counters
+# Run with python -m unittest test_engines (or pytest)
+# Author: Wilmer Pellicier
+import random
+import unittest
+
+from Interpreter import Interpreter, ENGINES
+from Input import SequenceInput
+from Output import ListOutput
+from Runtime import Limits
+
+# Values handed to the read statements of every run
+INPUTS = [7, 12, 5, -3, 0, 9]
+
+# Programs covering what generated ones rarely reach
+FIXTURES = {
+    'nested loops': '''
+        program int I, J, K;
+        begin
+        I = 4;
+        while (I > 0) loop
+          J = I;
+          while (J > 0) loop
+            K = 2;
+            if (J > 1) then
+              while (K > 0) loop K = K - 1; end;
+            end;
+            J = J - 1;
+          end;
+          I = I - 1;
+        end;
+        write I, J, K;
+        end''',
+    'short circuit': '''
+        program int X, Y;
+        begin
+        X = 1;
+        if [(X > 0) || (Y > 0)] then write X; end;
+        if [(X < 0) && (Y > 0)] then write X; else write X; end;
+        if [(X > 0) && (Y > 0)] then write X; end;
+        end''',
+    'undeclared': '''
+        program int X;
+        begin
+        X = 2;
+        write X;
+        Q = X;
+        write Q;
+        end''',
+    'uninitialized': '''
+        program int X, Y;
+        begin
+        X = 1;
+        while (X < 4) loop X = X + 1; end;
+        write X;
+        write Y;
+        end''',
+    'reads': '''
+        program int A, B, C;
+        begin
+        read A, B;
+        while (A > 0) loop
+          read C;
+          write C;
+          A = A - 4;
+        end;
+        end''',
+    'no comparison operator': '''
+        program int X, Y, Z;
+        begin
+        X = 1; Y = 2; Z = 5;
+        if (X Y 3) then write X; else write Y; end;
+        if !(X Y Z) then write Z; end;
+        while (X ; Y) loop X = X + 1; end;
+        if [(4 ; 5) || (1 < 2)] then write X; end;
+        write Y;
+        end''',
+    'constants': '''
+        program int X, Y, Z;
+        begin
+        X = (3 * 4) + 2 * 1;
+        Y = X * 1 + 0;
+        Z = Y * 0 + (X - (2 - Y)) - 5 - 5;
+        if [(1 < 2) && (X > 3)] then write X; else write Y; end;
+        if (2 == 3) then write Z; end;
+        while (1 > 2) loop X = X + 1; end;
+        write X, Y, Z;
+        end''',
+    'endless': '''
+        program int X;
+        begin
+        X = 0;
+        while (X == 0) loop
+          if (X > 1) then write X; end;
+        end;
+        end''',
+}
+
+# Seeds of the generated programs
+SEEDS = range(200)
+
+# Limits every run is stopped at, so generated programs always end
+LIMITS = Limits(statements=5000, iterations=400)
+
+
+# Class for Program Generator. Writes random Core programs, the same ones for
+# the same seed. Loops count down a counter of their own, and identifiers are
+# now and then left uninitialized or undeclared to reach the runtime errors
+class ProgramGenerator:
+    NAMES = ('A', 'B', 'C', 'D', 'E')
+
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+        self.loops = 0
+
+    # Returns the source of a program
+    def program(self):
+        init = ' '.join('%s = %d;' % (name, value) for value, name in enumerate(self.NAMES))
+        body = self.stmts(0, self.random.randint(3, 10))
+        if self.random.random() < 0.8:
+            body = init + ' ' + body
+        counters = ', '.join('L%d' % i for i in range(self.loops + 1))
+        return 'program int %s; int %s; begin %s end' % (', '.join(self.NAMES), counters, body)
+
+    # Returns count statements nested depth deep
+    def stmts(self, depth, count):
+        rand = self.random
+        out = []
+        for _ in range(count):
+            r = rand.random()
+            if r < 0.45:
+                out.append('%s = %s;' % (rand.choice(self.NAMES), self.exp(0)))
+            elif r < 0.6 and depth < 3:
+                stmt = 'if %s then %s' % (self.cond(0), self.stmts(depth + 1, rand.randint(1, 3)))
+                if rand.random() < 0.5:
+                    stmt += ' else ' + self.stmts(depth + 1, rand.randint(1, 3))
+                out.append(stmt + ' end;')
+            elif r < 0.7 and depth < 3:
+                self.loops += 1
+                counter = 'L%d' % self.loops
+                out.append('%s = %d; while [(%s > 0) && %s] loop %s = %s - 1; %s end;' % (
+                    counter, rand.randint(0, 6), counter, self.cond(0), counter, counter,
+                    self.stmts(depth + 1, rand.randint(1, 3))))
+            elif r < 0.78:
+                out.append('read %s;' % rand.choice(self.NAMES))
+            else:
+                names = rand.sample(self.NAMES, rand.randint(1, 3))
+                out.append('write %s;' % ', '.join(names))
+        return ' '.join(out)
+
+    # Returns a condition
+    def cond(self, depth):
+        r = self.random.random()
+        if r < 0.6 or depth > 2:
+            return '(%s %s %s)' % (self.op(depth), self.random.choice(('<', '>', '<=', '>=', '==', '!=')),
+                                   self.op(depth))
+        if r < 0.75:
+            return '!' + self.cond(depth + 1)
+        return '[%s %s %s]' % (self.cond(depth + 1), self.random.choice(('&&', '||')),
+                               self.cond(depth + 1))
+
+    # Returns an expression
+    def exp(self, depth):
+        out = self.fac(depth)
+        while self.random.random() < 0.4:
+            out += self.random.choice((' + ', ' - ')) + self.fac(depth)
+        return out
+
+    # Returns a factor
+    def fac(self, depth):
+        out = self.op(depth)
+        while self.random.random() < 0.25:
+            out += ' * ' + self.op(depth)
+        return out
+
+    # Returns an operand, now and then an undeclared identifier
+    def op(self, depth):
+        r = self.random.random()
+        if r < 0.35 or depth > 2:
+            return str(self.random.randint(0, 9))
+        if r < 0.8:
+            return 'Q' if self.random.random() < 0.03 else self.random.choice(self.NAMES)
+        return '(' + self.exp(depth + 1) + ')'
+
+
+# Returns what a run of interpreter on engine did: its output lines, error
+# message and counters
+def runOn(interpreter, engine):
+    output = ListOutput()
+    rt = interpreter.run(SequenceInput(INPUTS), engine, output)
+    error = None if rt.error is None else rt.error.message
+    return output.lines, error, rt.steps, rt.iterations, rt.reads
+
+
+class EngineTest(unittest.TestCase):
+    # Checks every engine against the tree engine on source, in every mode
+    def checkProgram(self, source):
+        for optimize in (False, True):
+            for short_circuit in (False, True):
+                interpreter = Interpreter(short_circuit=short_circuit, limits=LIMITS)
+                interpreter.parse(source)
+                if optimize:
+                    interpreter.optimize()
+                expected = runOn(interpreter, 'tree')
+                for engine in ENGINES:
+                    with self.subTest(engine=engine, optimize=optimize,
+                                      short_circuit=short_circuit):
+                        self.assertEqual(runOn(interpreter, engine), expected)
+
+    def testFixtures(self):
+        for name, source in FIXTURES.items():
+            with self.subTest(program=name):
+                self.checkProgram(source)
+
+    def testGenerated(self):
+        for seed in SEEDS:
+            with self.subTest(seed=seed):
+                self.checkProgram(ProgramGenerator(seed).program())
+
+
+if __name__ == '__main__':
+    unittest.main()